@@ -1,10 +1,48 @@
 from django.contrib import admin
+from django.contrib.admin import helpers
+from django.contrib.auth.models import User
+from django.template.response import TemplateResponse
 
-from .models import (Department, Exam, Profile, Question, Resource, Subject)
+from .forms import EnrollStudentsForm
+from .models import (Department, Exam, Profile, Question, QuestionPaperJob,
+                     Resource, Subject)
+from .subscriptions import enroll_students
+
+
+def enroll_cohort(modeladmin, request, queryset):
+    """Ask which students of the subjects' departments to subscribe, then
+    subscribe that cohort to every selected subject."""
+    students = User.objects.filter(
+        profile__status='student',
+        profile__department__in=set(
+            queryset.values_list('department', flat=True))
+    ).order_by('username')
+    form = EnrollStudentsForm(
+        students, request.POST if 'apply' in request.POST else None)
+    if form.is_valid():
+        added = enroll_students(
+            queryset, [x.id for x in form.cleaned_data['students']])
+        modeladmin.message_user(request, '%d subscriptions added.' % added)
+        return None
+    return TemplateResponse(request, 'admin/enroll_students.html', {
+        'title': 'Subscribe students',
+        'subjects': queryset,
+        'form': form,
+        'opts': modeladmin.model._meta,
+        'action_checkbox_name': helpers.ACTION_CHECKBOX_NAME,
+    })
+enroll_cohort.short_description = "Subscribe chosen students"
+
+
+class SubjectAdmin(admin.ModelAdmin):
+    list_display = ('code', 'name', 'course', 'semester', 'department')
+    list_filter = ('department', 'course', 'semester')
+    actions = [enroll_cohort]
 
 admin.site.register(Department)
 admin.site.register(Exam)
 admin.site.register(Profile)
 admin.site.register(Question)
+admin.site.register(QuestionPaperJob)
 admin.site.register(Resource)
-admin.site.register(Subject)
+admin.site.register(Subject, SubjectAdmin)
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class RepositoryConfig(AppConfig):
+    name = 'repository'
+
+    def ready(self):
+        import repository.signals  # noqa
@@ -0,0 +1,263 @@
+"""Query count and latency benchmarks for every route in vijnana/urls.py.
+
+seed() fills the database with a synthetic dataset, run() requests every
+route with the test client and compare() checks the results against a
+stored baseline."""
+import json
+import os
+import random
+import re
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.urlresolvers import RegexURLPattern, get_resolver
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from repository.counters import reconcile
+from repository.models import (Department, Exam, Profile, Question, Resource,
+                               Subject, question_hash)
+from repository.questionpool import invalidate_pool
+from repository.usage import recount_usage
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__),
+                             'benchmark_baseline.json')
+
+DEPARTMENTS = [
+    ('Civil Engineering', 'CE'),
+    ('Computer Science and Engineering', 'CSE'),
+    ('Electronics and Communication Engineering', 'ECE'),
+    ('Electrical and Electronics Engineering', 'EEE'),
+    ('Information Technology', 'IT'),
+    ('Mechanical Engineering', 'ME'),
+    ('MBA', 'MBA'),
+]
+
+CATEGORIES = ['presentation', 'paper_publication', 'subject_note',
+              'project_thesis', 'seminar_report', 'university_question_paper']
+
+LEVELS = ['Knowledge', 'Comprehension', 'Application', 'Analysis',
+          'Synthesis', 'Evaluation']
+
+SAMPLE_FILES = {
+    'resources': 'sample.pdf',
+    'questionpapers': 'sample.docx',
+    'profile_pictures': 'benchmark_hod.png',
+}
+
+
+def seed(scale=1.0, media_root=None):
+    """Create a synthetic dataset. At scale 1 this is 2000 students, 140
+    teachers, 300 subjects, 1500 resources, 5000 questions and 100 exams.
+    Returns the values used to fill in the URL patterns."""
+    rng = random.Random(0)
+    password = make_password('benchmark')
+
+    def count(n):
+        return max(1, int(n * scale))
+
+    Department.objects.bulk_create(
+        [Department(name=name, abbreviation=abbreviation)
+         for name, abbreviation in DEPARTMENTS])
+    departments = list(Department.objects.all())
+
+    users = [User(username='benchmark_hod', first_name='Head',
+                  last_name='Of Department', password=password)]
+    users += [User(username='benchmark_teacher%d' % i, first_name='Teacher',
+                   last_name=str(i), password=password)
+              for i in range(count(140))]
+    users += [User(username='benchmark_student%d' % i, first_name='Student',
+                   last_name=str(i), password=password)
+              for i in range(count(2000))]
+    User.objects.bulk_create(users)
+    users = list(User.objects.filter(
+        username__startswith='benchmark_').order_by('id'))
+    hod, teachers, students = users[0], users[1:count(140) + 1], \
+        users[count(140) + 1:]
+
+    profiles = [Profile(user=hod, department=departments[1], status='hod',
+                        picture='profile_pictures/benchmark_hod.png')]
+    profiles += [Profile(user=user, department=departments[i % 7],
+                         status='teacher')
+                 for i, user in enumerate(teachers)]
+    profiles += [Profile(user=user, department=departments[i % 7],
+                         status='student')
+                 for i, user in enumerate(students)]
+    Profile.objects.bulk_create(profiles)
+
+    Subject.objects.bulk_create(
+        [Subject(code='BM%04d' % i, name='Subject %d' % i, credit='4',
+                 course='BTech', semester='S%d' % (i % 8 + 1),
+                 department=departments[i % 7],
+                 description='Synthetic subject %d' % i)
+         for i in range(count(300))])
+    subjects = list(Subject.objects.filter(
+        code__startswith='BM').order_by('id'))
+    subject = subjects[1]
+
+    Staff = Subject.staff.through
+    Staff.objects.bulk_create(
+        [Staff(subject_id=x.id, user_id=rng.choice(teachers).id)
+         for x in subjects] + [Staff(subject_id=subject.id, user_id=hod.id)])
+    Students = Subject.students.through
+    subscriptions = set()
+    for student in students:
+        for x in rng.sample(subjects, min(8, len(subjects))):
+            subscriptions.add((x.id, student.id))
+    Students.objects.bulk_create(
+        [Students(subject_id=x, user_id=y) for x, y in subscriptions])
+
+    Resource.objects.bulk_create(
+        [Resource(title='Resource %d' % i, category=CATEGORIES[i % 6],
+                  subject=subjects[i % len(subjects)],
+                  resourcefile='resources/' + SAMPLE_FILES['resources'],
+                  uploader=rng.choice(teachers))
+         for i in range(count(1500))])
+
+    # Question banks and exams belong to the first 20 subjects.
+    exam_subjects = subjects[:20]
+    Question.objects.bulk_create(
+        [Question(text='Synthetic question %d' % i,
+                  text_hash=question_hash('Synthetic question %d' % i),
+                  module=i % 4 + 1,
+                  part='ABC'[i % 3], co=str(i % 5 + 1), level=LEVELS[i % 6],
+                  subject=exam_subjects[i % len(exam_subjects)])
+         for i in range(count(5000))])
+
+    Exam.objects.bulk_create(
+        [Exam(name='Exam %d' % i, totalmarks='100', time='3',
+              subject=exam_subjects[i % len(exam_subjects)],
+              questionpaper='questionpapers/' +
+              SAMPLE_FILES['questionpapers'])
+         for i in range(count(100))])
+    Used = Question.exam.through
+    used = []
+    for exam in Exam.objects.all():
+        question_ids = Question.objects.filter(
+            subject_id=exam.subject_id).values_list('id', flat=True)[:20]
+        used += [Used(exam_id=exam.id, question_id=x) for x in question_ids]
+    Used.objects.bulk_create(used)
+    # bulk_create() skips the signals that maintain the counters and the
+    # question usage, and that drop the cached question pools.
+    reconcile()
+    recount_usage()
+    for exam_subject in exam_subjects:
+        invalidate_pool(exam_subject.id)
+
+    if media_root:
+        for directory, filename in SAMPLE_FILES.items():
+            path = os.path.join(media_root, directory)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+            with open(os.path.join(path, filename), 'wb') as f:
+                f.write(os.urandom(256 * 1024))
+
+    return {
+        'user': hod,
+        'values': {
+            'subject_id': subject.id,
+            'exam_id': Exam.objects.filter(subject=subject).first().id,
+            'resource_id': Resource.objects.filter(subject=subject).first().id,
+            'username': hod.username,
+            'type_name': 'Subject_Note',
+        },
+    }
+
+
+def routes():
+    """Return (pattern, view name) pairs for the routes in the URLconf,
+    leaving out included URLconfs such as the admin."""
+    result = []
+    for pattern in get_resolver(None).url_patterns:
+        if not isinstance(pattern, RegexURLPattern):
+            continue
+        view = getattr(pattern.callback, 'view_class', pattern.callback)
+        result.append((pattern.regex.pattern, view.__name__))
+    return result
+
+
+def fill_pattern(regex, values):
+    """Build a concrete URL from a route regex."""
+    def replace(match):
+        name = match.group(1)
+        if name == 'path':
+            directory = regex.split('/')[1]
+            return SAMPLE_FILES.get(directory, '')
+        return str(values[name])
+    url = re.sub(r'\(\?P<(\w+)>[^)]*\)', replace, regex)
+    url = url.replace('(/)?', '/').lstrip('^').rstrip('$')
+    return '/' + url
+
+
+def percentile(timings, fraction):
+    timings = sorted(timings)
+    index = int(round(fraction * (len(timings) - 1)))
+    return timings[index]
+
+
+def run(user, values, iterations=10):
+    """Request every route `iterations` times as `user`, returning a dict of
+    results keyed by route pattern."""
+    client = Client()
+    results = {}
+    for regex, name in routes():
+        url = fill_pattern(regex, values)
+        timings = []
+        for _ in range(iterations):
+            client.force_login(user)
+            # The query log is capped, clear it so counts stay accurate.
+            connection.queries_log.clear()
+            with CaptureQueriesContext(connection) as queries:
+                start = time.time()
+                response = client.get(url)
+                if response.streaming:
+                    size = sum(len(x) for x in response.streaming_content)
+                else:
+                    size = len(response.content)
+                timings.append((time.time() - start) * 1000)
+        results[regex] = {
+            'view': name,
+            'url': url,
+            'status': response.status_code,
+            'queries': len(queries),
+            'p50_ms': round(percentile(timings, 0.5), 2),
+            'p95_ms': round(percentile(timings, 0.95), 2),
+            'bytes': size,
+        }
+    return results
+
+
+def compare(results, baseline, latency_tolerance=None):
+    """Return a list of regressions of `results` against `baseline`. A route
+    regresses when it runs more queries than before, or, when
+    `latency_tolerance` is given, when its p95 latency grows by more than
+    that factor."""
+    regressions = []
+    for regex, result in sorted(results.items()):
+        before = baseline.get(regex)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append('%s (%s): %d queries, baseline %d' % (
+                result['view'], result['url'], result['queries'],
+                before['queries']))
+        if latency_tolerance and \
+                result['p95_ms'] > before['p95_ms'] * latency_tolerance:
+            regressions.append('%s (%s): p95 %.1f ms, baseline %.1f ms' % (
+                result['view'], result['url'], result['p95_ms'],
+                before['p95_ms']))
+    return regressions
+
+
+def load_baseline(path=BASELINE_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baseline(scale, results, path=BASELINE_PATH):
+    with open(path, 'w') as f:
+        json.dump({'scale': scale, 'results': results}, f, indent=2,
+                  separators=(',', ': '), sort_keys=True)
+        f.write('\n')
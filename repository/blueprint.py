@@ -0,0 +1,300 @@
+"""Question selection from a blueprint.
+
+A blueprint describes a question paper by its shape rather than by exact
+(module, part, level) counts: how many questions each part has and what each
+is worth, which course outcomes the paper must cover, how many questions of
+each level it has, and how many of the subject's latest exams it must not
+repeat questions from.
+
+The solver works on counts over the cells of the question pool, (part,
+level, course outcome) groups of question ids, so its cost does not grow
+with the size of the question bank beyond one pass to collect the cells.
+Questions are only sampled from the cells once the counts are settled."""
+import random
+from collections import OrderedDict, deque
+
+from repository.questionpool import get_pool
+from repository.usage import recently_used
+
+PARTS = ('A', 'B', 'C')
+# Randomized attempts at covering the course outcomes before giving up.
+ATTEMPTS = 20
+
+
+def to_int(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise ValueError('%s must be a number' % name)
+    if number < 0:
+        raise ValueError('%s must not be negative' % name)
+    return number
+
+
+class Blueprint(object):
+    """The shape of a question paper.
+
+    `parts` maps 'A', 'B' and 'C' to (count, marks per question) pairs.
+    `outcomes` are course outcomes the paper must have a question of, and
+    `levels`, when given, maps levels to the exact number of questions of
+    each. `modules` limits the questions to some modules, and questions of
+    the latest `recent_exams` exams of the subject are left out."""
+
+    def __init__(self, parts, total_marks=None, outcomes=(), levels=None,
+                 modules=None, recent_exams=0):
+        self.parts = OrderedDict((part, parts[part]) for part in PARTS
+                                 if part in parts and parts[part][0])
+        self.total_marks = total_marks
+        self.outcomes = list(outcomes)
+        self.levels = OrderedDict(
+            (level, count) for level, count in sorted(levels.items())
+            if count) if levels else None
+        self.modules = set(modules) if modules else None
+        self.recent_exams = recent_exams
+
+    @property
+    def total_questions(self):
+        return sum(count for count, _ in self.parts.values())
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a blueprint from its JSON form, such as
+        {"parts": {"A": {"count": 10, "marks": 2}}, "total_marks": 20,
+        "outcomes": ["1", "2"], "levels": {"Knowledge": 6,
+        "Application": 4}, "modules": [1, 2], "recent_exams": 3}.
+        Raises ValueError for a malformed or inconsistent blueprint."""
+        if not isinstance(data, dict) or \
+                not isinstance(data.get('parts'), dict):
+            raise ValueError('A blueprint needs the parts of the paper')
+        parts = {}
+        for part, spec in data['parts'].items():
+            if part not in PARTS or not isinstance(spec, dict):
+                raise ValueError('Invalid part %s' % part)
+            parts[part] = (to_int(spec.get('count'), 'Part %s count' % part),
+                           to_int(spec.get('marks'), 'Part %s marks' % part))
+        total_marks = data.get('total_marks')
+        if total_marks is not None:
+            total_marks = to_int(total_marks, 'Total marks')
+        levels = data.get('levels')
+        if levels is not None:
+            if not isinstance(levels, dict):
+                raise ValueError('Levels must map levels to counts')
+            levels = dict((level, to_int(count, level))
+                          for level, count in levels.items())
+        outcomes = data.get('outcomes') or []
+        modules = data.get('modules') or []
+        if not isinstance(outcomes, list) or not isinstance(modules, list):
+            raise ValueError('Outcomes and modules must be lists')
+        blueprint = cls(
+            parts, total_marks, [unicode(x) for x in outcomes], levels,
+            [to_int(x, 'Module') for x in modules],
+            to_int(data.get('recent_exams', 0), 'Recent exams'))
+        blueprint.check()
+        return blueprint
+
+    def to_dict(self):
+        return {
+            'parts': dict((part, {'count': count, 'marks': marks})
+                          for part, (count, marks) in self.parts.items()),
+            'total_marks': self.total_marks,
+            'outcomes': self.outcomes,
+            'levels': dict(self.levels) if self.levels else None,
+            'modules': sorted(self.modules) if self.modules else [],
+            'recent_exams': self.recent_exams,
+        }
+
+    def check(self):
+        """Raise ValueError when the blueprint contradicts itself."""
+        if not self.parts:
+            raise ValueError('A blueprint needs at least one question')
+        marks = sum(count * each for count, each in self.parts.values())
+        if self.total_marks is not None and marks != self.total_marks:
+            raise ValueError('The parts add up to %d marks, not %d' %
+                             (marks, self.total_marks))
+        if self.levels is not None and \
+                sum(self.levels.values()) != self.total_questions:
+            raise ValueError('The levels add up to %d questions, not %d' %
+                             (sum(self.levels.values()),
+                              self.total_questions))
+        if len(set(self.outcomes)) > self.total_questions:
+            raise ValueError('%d questions cannot cover %d course outcomes' %
+                             (self.total_questions, len(set(self.outcomes))))
+
+
+def candidate_cells(pool, blueprint, exclude=()):
+    """Group the pool's questions that the blueprint allows into cells keyed
+    by (part, level, course outcome)."""
+    cells = {}
+    for (module, part, level, co), ids in pool.cells.items():
+        if part not in blueprint.parts or \
+                (blueprint.modules and module not in blueprint.modules) or \
+                (blueprint.levels is not None and
+                 level not in blueprint.levels):
+            continue
+        if exclude:
+            ids = [x for x in ids if x not in exclude]
+        if ids:
+            cells.setdefault((part, level, co), []).extend(ids)
+    return cells
+
+
+def max_flow(capacity, source, sink):
+    """Edmonds-Karp maximum flow. `capacity` maps each node to a dict of
+    its neighbours and edge capacities; it is left holding the residual
+    capacities. The graphs here have a handful of nodes."""
+    for node, edges in capacity.items():
+        for other in edges:
+            capacity.setdefault(other, {}).setdefault(node, 0)
+    total = 0
+    while True:
+        parents = {source: None}
+        queue = deque([source])
+        while queue and sink not in parents:
+            node = queue.popleft()
+            for other, left in capacity[node].items():
+                if left > 0 and other not in parents:
+                    parents[other] = node
+                    queue.append(other)
+        if sink not in parents:
+            return total
+        path = []
+        node = sink
+        while parents[node] is not None:
+            path.append((parents[node], node))
+            node = parents[node]
+        amount = min(capacity[a][b] for a, b in path)
+        for a, b in path:
+            capacity[a][b] -= amount
+            capacity[b][a] += amount
+        total += amount
+
+
+def feasible(available, part_left, level_left):
+    """Whether the questions left in `available`, which maps (part, level)
+    to counts, can fill the parts and levels still open."""
+    if level_left is None:
+        return all(sum(count for (p, _), count in available.items()
+                       if p == part) >= needed
+                   for part, needed in part_left.items())
+    capacity = {'source': {}}
+    for part, needed in part_left.items():
+        capacity['source'][('part', part)] = needed
+        capacity[('part', part)] = {}
+    for level, needed in level_left.items():
+        capacity[('level', level)] = {'sink': needed}
+    for (part, level), count in available.items():
+        if count and part_left.get(part) and level_left.get(level):
+            capacity[('part', part)][('level', level)] = count
+    return max_flow(capacity, 'source', 'sink') == sum(part_left.values())
+
+
+def take(cell, part_left, level_left, available, counts):
+    part, level = cell[0], cell[1]
+    part_left[part] -= 1
+    if level_left is not None:
+        level_left[level] -= 1
+    available[(part, level)] -= 1
+    counts[cell] = counts.get(cell, 0) + 1
+
+
+def allocate(cells, blueprint):
+    """Decide how many questions to take from each cell. Course outcomes
+    are covered first, then the remaining places are filled one at a time
+    from a random cell, weighted by its size, keeping only choices after
+    which the parts and levels can still be filled. Returns a dict mapping
+    cells to counts, or raises ValueError."""
+    sizes = dict(((part, level), 0) for part, level, _ in cells)
+    for (part, level, _), ids in cells.items():
+        sizes[(part, level)] += len(ids)
+    part_left = dict((part, count)
+                     for part, (count, _) in blueprint.parts.items())
+    level_left = dict(blueprint.levels) if blueprint.levels else None
+    for part, needed in part_left.items():
+        available = sum(n for (p, _), n in sizes.items() if p == part)
+        if available < needed:
+            raise ValueError('Part %s needs %d questions, %d available' %
+                             (part, needed, available))
+    for outcome in set(blueprint.outcomes):
+        if not any(co == outcome for _, _, co in cells):
+            raise ValueError('No questions for course outcome %s' % outcome)
+    if not feasible(sizes, part_left, level_left):
+        raise ValueError('The available questions cannot make up the '
+                         'level mix of the blueprint')
+    # Cover the outcomes with the fewest questions first.
+    outcomes = sorted(set(blueprint.outcomes), key=lambda x: (
+        sum(len(ids) for (_, _, co), ids in cells.items() if co == x),
+        random.random()))
+    for _ in range(ATTEMPTS):
+        counts = {}
+        available = dict(sizes)
+        parts = dict(part_left)
+        levels = dict(level_left) if level_left is not None else None
+        covered = True
+        for outcome in outcomes:
+            choices = [cell for cell in cells if cell[2] == outcome and
+                       parts[cell[0]] and
+                       (levels is None or levels[cell[1]])]
+            random.shuffle(choices)
+            for cell in choices:
+                trial_parts, trial_available = dict(parts), dict(available)
+                trial_levels = dict(levels) if levels is not None else None
+                take(cell, trial_parts, trial_levels, trial_available,
+                     counts)
+                if feasible(trial_available, trial_parts, trial_levels):
+                    parts, levels, available = (trial_parts, trial_levels,
+                                                trial_available)
+                    break
+                counts[cell] -= 1
+            else:
+                covered = False
+                break
+        if covered:
+            break
+    else:
+        raise ValueError('No selection covers the course outcomes of the '
+                         'blueprint')
+    while any(parts.values()):
+        choices = [(cell, len(ids) - counts.get(cell, 0))
+                   for cell, ids in cells.items()
+                   if len(ids) > counts.get(cell, 0) and parts[cell[0]] and
+                   (levels is None or levels[cell[1]])]
+        while True:
+            point = random.random() * sum(n for _, n in choices)
+            for i, (cell, n) in enumerate(choices):
+                point -= n
+                if point < 0:
+                    break
+            trial_parts, trial_available = dict(parts), dict(available)
+            trial_levels = dict(levels) if levels is not None else None
+            take(cell, trial_parts, trial_levels, trial_available, counts)
+            if feasible(trial_available, trial_parts, trial_levels):
+                parts, levels, available = (trial_parts, trial_levels,
+                                            trial_available)
+                break
+            counts[cell] -= 1
+            del choices[i]
+    return counts
+
+
+def solve(pool, blueprint, exclude=()):
+    """Select question ids for a blueprint from a question pool, leaving out
+    the ids in `exclude`. Returns a dict mapping 'Part A', 'Part B' and
+    'Part C' to lists of ids, or raises ValueError when the blueprint
+    cannot be met."""
+    cells = candidate_cells(pool, blueprint, exclude)
+    selected = {'Part A': [], 'Part B': [], 'Part C': []}
+    for (part, level, co), count in allocate(cells, blueprint).items():
+        if count:
+            selected['Part ' + part] += random.sample(cells[(part, level,
+                                                             co)], count)
+    for ids in selected.values():
+        random.shuffle(ids)
+    return selected
+
+
+def select_questions(subject, blueprint, exclude=()):
+    """Select the questions of a paper of `subject` for a blueprint, leaving
+    out the recently used questions as well as the ids in `exclude`."""
+    exclude = set(exclude) | recently_used(subject.id,
+                                           blueprint.recent_exams)
+    return solve(get_pool(subject.id), blueprint, exclude)
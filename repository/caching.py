@@ -0,0 +1,34 @@
+import time
+
+from django.core.cache import cache
+
+VERSION_KEY = 'version:%s'
+
+
+def new_version():
+    # Versions start from the current time, so entries cached under an
+    # evicted version number are never picked up again.
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    """Return the current version of a namespace of cached entries."""
+    version = cache.get(VERSION_KEY % namespace)
+    if version is None:
+        version = new_version()
+        if not cache.add(VERSION_KEY % namespace, version, None):
+            version = cache.get(VERSION_KEY % namespace, version)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every entry cached under the current version of a
+    namespace."""
+    try:
+        cache.incr(VERSION_KEY % namespace)
+    except ValueError:
+        cache.set(VERSION_KEY % namespace, new_version(), None)
+
+
+def subject_namespace(subject_id):
+    return 'subject:%s' % subject_id
@@ -0,0 +1,77 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+
+from repository.models import Exam, Question, Resource, Subject
+
+CATEGORY_COUNT_CACHE_KEY = 'resourcecount:%s'
+# Changes that bypass the signals, such as queryset updates, are picked up
+# after this many seconds.
+CATEGORY_COUNT_TIMEOUT = 10 * 60
+
+# Counter field of Subject, and the table of rows it counts.
+COUNTERS = [
+    ('subscriber_count', Subject.students.through),
+    ('resource_count', Resource),
+    ('question_count', Question),
+    ('exam_count', Exam),
+]
+
+
+def adjust(field, subject_ids, amount=1):
+    """Add `amount` to a counter of the given subjects. The addition is
+    done by the database, so concurrent updates aren't lost. Call it in
+    the transaction that adds or removes the counted rows."""
+    if amount and subject_ids:
+        Subject.objects.filter(id__in=subject_ids).update(
+            **{field: F(field) + amount})
+
+
+def recount(field, subject_ids):
+    """Set a counter of the given subjects from the related table."""
+    model = dict(COUNTERS)[field]
+    counts = dict(model.objects.filter(subject_id__in=subject_ids)
+                  .values_list('subject_id').annotate(Count('pk')).order_by())
+    for subject_id in subject_ids:
+        Subject.objects.filter(id=subject_id).update(
+            **{field: counts.get(subject_id, 0)})
+
+
+def category_count(category):
+    """Number of resources in a category, cached until a resource is added,
+    changed or deleted, or for CATEGORY_COUNT_TIMEOUT seconds."""
+    key = CATEGORY_COUNT_CACHE_KEY % category
+    count = cache.get(key)
+    if count is None:
+        count = Resource.objects.filter(category=category).count()
+        cache.set(key, count, CATEGORY_COUNT_TIMEOUT)
+    return count
+
+
+def invalidate_category_counts(categories):
+    cache.delete_many([CATEGORY_COUNT_CACHE_KEY % x for x in categories])
+
+
+def actual_counts():
+    """Return {field: {subject id: count}} counted from the related
+    tables."""
+    return dict(
+        (field, dict(model.objects.values_list('subject_id').annotate(
+            Count('pk')).order_by()))
+        for field, model in COUNTERS)
+
+
+def reconcile():
+    """Set the counters of every subject from the related tables. Returns
+    the ids of subjects whose counters had drifted."""
+    fields = [field for field, _ in COUNTERS]
+    drifted = []
+    with transaction.atomic():
+        counts = actual_counts()
+        for subject in Subject.objects.values('id', *fields):
+            expected = dict((field, counts[field].get(subject['id'], 0))
+                            for field in fields)
+            if any(subject[field] != expected[field] for field in fields):
+                Subject.objects.filter(id=subject['id']).update(**expected)
+                drifted.append(subject['id'])
+    return drifted
@@ -0,0 +1,164 @@
+import hashlib
+import logging
+import os
+from multiprocessing import Pool
+
+from django.db import connections
+from django.utils.encoding import force_text
+from docx import Document
+from openpyxl import load_workbook
+
+from repository.models import Resource, ResourceText
+from repository.search import index_resource
+
+try:
+    from pdfminer.high_level import extract_text as extract_pdf_text
+except ImportError:
+    extract_pdf_text = None
+
+try:
+    from pptx import Presentation
+except ImportError:
+    Presentation = None
+
+logger = logging.getLogger(__name__)
+
+# Keep the search documents of huge files to a reasonable size.
+MAX_TEXT_LENGTH = 1000000
+
+EXTRACTED = 'extracted'
+UNCHANGED = 'unchanged'
+FAILED = 'failed'
+MISSING = 'missing'
+SKIPPED = 'skipped'
+
+
+class ExtractorUnavailable(Exception):
+    """The library that reads a file format is not installed."""
+
+
+def file_hash(path):
+    hashout = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            hashout.update(chunk)
+    return hashout.hexdigest()
+
+
+def docx_text(path):
+    document = Document(path)
+    lines = [paragraph.text for paragraph in document.paragraphs]
+    for table in document.tables:
+        for row in table.rows:
+            lines.extend(cell.text for cell in row.cells)
+    return '\n'.join(lines)
+
+
+def pptx_text(path):
+    if Presentation is None:
+        raise ExtractorUnavailable('python-pptx is not installed')
+    lines = []
+    for slide in Presentation(path).slides:
+        for shape in slide.shapes:
+            if shape.has_text_frame:
+                lines.append(shape.text_frame.text)
+    return '\n'.join(lines)
+
+
+def xlsx_text(path):
+    workbook = load_workbook(filename=path, read_only=True)
+    lines = []
+    for worksheet in workbook.worksheets:
+        for row in worksheet.rows:
+            lines.append(' '.join(unicode(cell.value) for cell in row
+                                  if cell.value is not None))
+    return '\n'.join(lines)
+
+
+def pdf_text(path):
+    if extract_pdf_text is None:
+        raise ExtractorUnavailable('pdfminer.six is not installed')
+    return extract_pdf_text(path)
+
+
+EXTRACTORS = {
+    '.docx': docx_text,
+    '.pdf': pdf_text,
+    '.pptx': pptx_text,
+    '.xlsx': xlsx_text,
+}
+
+
+def extract_text(path):
+    """Return the plain text of a file, or an empty string when its format
+    is not supported. Raises ExtractorUnavailable when the format is
+    supported but its library is missing."""
+    extractor = EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        return ''
+    return extractor(path)[:MAX_TEXT_LENGTH]
+
+
+def process_resource(resource_id):
+    """Extract the text of a resource's file and add it to the search index.
+    Files whose hash has not changed since the last run are not parsed
+    again. Nothing is recorded for a file whose extractor is not installed,
+    so it is tried again on the next run."""
+    resource = Resource.objects.select_related('subject').get(id=resource_id)
+    try:
+        content_hash = file_hash(resource.resourcefile.path)
+    except (IOError, OSError):
+        return MISSING
+    resource_text = ResourceText.objects.filter(resource=resource).first()
+    if resource_text and resource_text.content_hash == content_hash:
+        return UNCHANGED
+    try:
+        text = extract_text(resource.resourcefile.path)
+        error = ''
+        status = EXTRACTED
+    except ExtractorUnavailable as e:
+        logger.warning('Skipping resource %s: %s', resource_id, e)
+        return SKIPPED
+    except Exception as e:
+        logger.exception('Extracting text of resource %s failed',
+                         resource_id)
+        text = ''
+        error = force_text(e, errors='replace')
+        status = FAILED
+    if resource_text is None:
+        resource_text = ResourceText(resource=resource)
+    resource_text.content_hash = content_hash
+    resource_text.text = text
+    resource_text.error = error
+    resource_text.save()
+    index_resource(resource, body=resource_text.text)
+    return status
+
+
+def pending_resource_ids(recheck=False):
+    """Ids of resources whose text has not been extracted yet. With
+    `recheck`, all resources are returned so that changed files are
+    picked up."""
+    resources = Resource.objects.all()
+    if not recheck:
+        resources = resources.filter(text__isnull=True)
+    return list(resources.order_by('id').values_list('id', flat=True))
+
+
+def process_backlog(resource_ids, processes=None):
+    """Extract the text of the given resources with a pool of worker
+    processes. Returns a dict counting the results of each status."""
+    if processes == 1:
+        results = [process_resource(x) for x in resource_ids]
+    else:
+        connections.close_all()
+        pool = Pool(processes)
+        try:
+            results = pool.map(process_resource, resource_ids)
+        finally:
+            pool.close()
+            pool.join()
+    counts = {}
+    for status in results:
+        counts[status] = counts.get(status, 0) + 1
+    return counts
@@ -1,14 +1,6 @@
 from django import forms
-from django.contrib.auth.models import User
 
-
-def get_user_ids():
-    try:
-        return [(x.id, x.first_name + " " + x.last_name)
-                for x in User.objects.all()
-                if x.profile.status == 'teacher' or x.profile.status == 'hod']
-    except:
-        return []
+from repository.staff import get_staff_choices
 
 
 class SignInForm(forms.Form):
@@ -36,8 +28,13 @@ class SearchForm(forms.Form):
 
 
 class AssignOrRemoveStaffForm(forms.Form):
-    user_ids = get_user_ids()
-    staffselect = forms.MultipleChoiceField(choices=user_ids)
+    staffselect = forms.MultipleChoiceField()
+
+    def __init__(self, *args, **kwargs):
+        super(AssignOrRemoveStaffForm, self).__init__(*args, **kwargs)
+        # Read from the cached staff directory when the form is built, so
+        # new teachers show up without a restart.
+        self.fields['staffselect'].choices = get_staff_choices()
 
 
 class NewSubjectForm(forms.Form):
@@ -74,9 +71,15 @@ class QuestionBankUploadForm(forms.Form):
 
 
 class QuestionPaperGenerateForm(forms.Form):
+    MAX_SETS = 10
+
     examname = forms.CharField()
     totalmarks = forms.CharField()
     time = forms.CharField()
+    sets = forms.IntegerField(required=False, min_value=1, max_value=MAX_SETS)
+    max_overlap = forms.IntegerField(required=False, min_value=0)
+    # JSON blueprint of the paper, used instead of the question types
+    blueprint = forms.CharField(required=False, widget=forms.Textarea)
 
 
 class QuestionPaperCategoryForm(forms.Form):
@@ -84,3 +87,12 @@ class QuestionPaperCategoryForm(forms.Form):
     part = forms.CharField()
     level = forms.CharField()
     count = forms.CharField()
+
+
+class EnrollStudentsForm(forms.Form):
+    students = forms.ModelMultipleChoiceField(
+        queryset=None, widget=forms.CheckboxSelectMultiple)
+
+    def __init__(self, students, *args, **kwargs):
+        super(EnrollStudentsForm, self).__init__(*args, **kwargs)
+        self.fields['students'].queryset = students
@@ -0,0 +1,94 @@
+import json
+import logging
+import time
+from datetime import timedelta
+
+from django.db import connections
+from django.utils import timezone
+from django.utils.encoding import force_text
+
+from repository.blueprint import Blueprint
+from repository.models import QuestionPaperJob
+from repository.questionpaper import (create_qp_dataset,
+                                      create_qp_from_blueprint,
+                                      create_qp_sets)
+
+logger = logging.getLogger(__name__)
+
+POLL_INTERVAL = 2
+STALE_AFTER = timedelta(minutes=10)
+
+
+def enqueue_questionpaper(exam, criteria, max_overlap=0):
+    """Queue generation of the question paper of an exam, and of the exams
+    that are other sets of it. `criteria` is a list of (module, part, level,
+    count) tuples, or a Blueprint."""
+    if isinstance(criteria, Blueprint):
+        criteria = {'blueprint': criteria.to_dict()}
+    return QuestionPaperJob.objects.create(exam=exam,
+                                           criteria=json.dumps(criteria),
+                                           max_overlap=max_overlap)
+
+
+def claim_job():
+    """Atomically mark the oldest pending job as running and return it.
+    Jobs left running by a worker that died are picked up again."""
+    stale = timezone.now() - STALE_AFTER
+    QuestionPaperJob.objects.filter(
+        status=QuestionPaperJob.RUNNING,
+        updated_at__lt=stale).update(status=QuestionPaperJob.PENDING)
+    while True:
+        job = QuestionPaperJob.objects.filter(
+            status=QuestionPaperJob.PENDING).order_by('id').first()
+        if job is None:
+            return None
+        claimed = QuestionPaperJob.objects.filter(
+            id=job.id, status=QuestionPaperJob.PENDING).update(
+                status=QuestionPaperJob.RUNNING, updated_at=timezone.now())
+        if claimed:
+            job.status = QuestionPaperJob.RUNNING
+            return job
+
+
+def run_job(job):
+    exam = job.exam
+    sets = list(exam.sets.order_by('id'))
+    try:
+        criteria = json.loads(job.criteria)
+        if isinstance(criteria, dict):
+            create_qp_from_blueprint(
+                exam.subject, [exam] + sets,
+                Blueprint.from_dict(criteria['blueprint']))
+        elif sets:
+            create_qp_sets(exam.subject, [exam] + sets, criteria,
+                           job.max_overlap)
+        else:
+            create_qp_dataset(exam.subject, exam, exam.totalmarks, exam.time,
+                              criteria)
+        job.status = QuestionPaperJob.DONE
+    except Exception as e:
+        logger.exception('Question paper job %s failed', job.id)
+        job.status = QuestionPaperJob.FAILED
+        job.error = force_text(e, errors='replace')
+    job.save()
+
+
+def run_pending_jobs():
+    """Run queued jobs until the queue is empty. Returns the number of jobs
+    run."""
+    count = 0
+    job = claim_job()
+    while job is not None:
+        run_job(job)
+        count += 1
+        job = claim_job()
+    return count
+
+
+def work(poll_interval=POLL_INTERVAL):
+    """Worker loop: run jobs as they arrive, polling the queue when it is
+    empty."""
+    connections.close_all()
+    while True:
+        if not run_pending_jobs():
+            time.sleep(poll_interval)
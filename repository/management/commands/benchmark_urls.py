@@ -0,0 +1,88 @@
+import json
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+
+from repository.benchmark import (BASELINE_PATH, compare, load_baseline, run,
+                                  save_baseline, seed)
+
+
+class Command(BaseCommand):
+    help = ('Seed a test database with synthetic data, request every URL '
+            'and report query counts, latency and response sizes. Fails '
+            'when a route runs more queries than in the baseline.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0,
+                            help='Size of the synthetic dataset.')
+        parser.add_argument('--iterations', type=int, default=10,
+                            help='Requests per route.')
+        parser.add_argument('--baseline', default=BASELINE_PATH,
+                            help='Baseline file to compare against.')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store the results as the new baseline.')
+        parser.add_argument('--latency-tolerance', type=float, default=None,
+                            help='Also fail when p95 latency grows by more '
+                            'than this factor over the baseline.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        # The synthetic rows, and the ones the migrations of the test
+        # database create, reuse the ids of real ones, so anything cached
+        # from them must stay out of the site's cache.
+        with override_settings(CACHES=settings.TEST_CACHES):
+            results = self.benchmark(options)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+        else:
+            self.stdout.write('%-24s %-48s %6s %7s %9s %9s %9s' % (
+                'View', 'URL', 'Status', 'Queries', 'p50 ms', 'p95 ms',
+                'Bytes'))
+            for regex, result in sorted(results.items(),
+                                        key=lambda x: x[1]['url']):
+                self.stdout.write('%-24s %-48s %6d %7d %9.1f %9.1f %9d' % (
+                    result['view'], result['url'], result['status'],
+                    result['queries'], result['p50_ms'], result['p95_ms'],
+                    result['bytes']))
+
+        if options['save_baseline']:
+            save_baseline(options['scale'], results, options['baseline'])
+            self.stdout.write('Saved baseline to ' + options['baseline'])
+            return
+        try:
+            baseline = load_baseline(options['baseline'])
+        except IOError:
+            self.stdout.write('No baseline found at ' + options['baseline'])
+            return
+        if baseline['scale'] != options['scale']:
+            raise CommandError('The baseline was recorded at scale %s.' %
+                               baseline['scale'])
+        regressions = compare(results, baseline['results'],
+                              options['latency_tolerance'])
+        if regressions:
+            raise CommandError('Regressions against the baseline:\n' +
+                               '\n'.join(regressions))
+        self.stdout.write('No regressions against the baseline.')
+
+    def benchmark(self, options):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0,
+                                                      autoclobber=True)
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root, DEBUG=False,
+                                   REQUEST_PROFILING_SAMPLE_RATE=0):
+                dataset = seed(options['scale'], media_root)
+                return run(dataset['user'], dataset['values'],
+                           options['iterations'])
+        finally:
+            shutil.rmtree(media_root)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from repository.extraction import pending_resource_ids, process_backlog
+
+
+class Command(BaseCommand):
+    help = ('Extract the text of uploaded resources and add it to the '
+            'search index.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='Number of worker processes. Defaults to the CPU count.')
+        parser.add_argument(
+            '--recheck', action='store_true',
+            help='Check every resource for changed files, not only the '
+            'ones never processed.')
+        parser.add_argument(
+            '--watch', type=float, default=0, metavar='SECONDS',
+            help='Keep running, checking for new resources at this '
+            'interval.')
+
+    def handle(self, *args, **options):
+        while True:
+            resource_ids = pending_resource_ids(options['recheck'])
+            if resource_ids:
+                counts = process_backlog(resource_ids, options['processes'])
+                self.stdout.write(', '.join(
+                    '%s: %d' % x for x in sorted(counts.items())))
+            if not options['watch']:
+                break
+            time.sleep(options['watch'])
@@ -0,0 +1,56 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from repository.benchmark import percentile
+
+
+class Command(BaseCommand):
+    help = ('Start fresh Python processes and report how long loading the '
+            'settings, the apps, the WSGI application and the URLconf '
+            'takes, and the queries run on the way.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5,
+                            help='Number of processes to start.')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ,
+                   DJANGO_SETTINGS_MODULE=os.environ.get(
+                       'DJANGO_SETTINGS_MODULE', 'vijnana.settings'))
+        runs = []
+        for _ in range(options['runs']):
+            process = subprocess.Popen(
+                [sys.executable, '-m', 'repository.startup'],
+                cwd=os.path.abspath(settings.BASE_DIR), env=env,
+                stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            output, errors = process.communicate()
+            if process.returncode:
+                raise CommandError('Startup failed:\n' + errors)
+            runs.append(json.loads(output))
+
+        results = []
+        for i, (phase, _, queries) in enumerate(runs[0]):
+            timings = [run[i][1] for run in runs]
+            results.append({
+                'phase': phase,
+                'median_ms': percentile(timings, 0.5),
+                'max_ms': max(timings),
+                'queries': queries,
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2, sort_keys=True))
+            return
+        self.stdout.write('%-20s %10s %10s %8s' % ('Phase', 'Median ms',
+                                                   'Max ms', 'Queries'))
+        for result in results:
+            self.stdout.write('%-20s %10.1f %10.1f %8d' % (
+                result['phase'], result['median_ms'], result['max_ms'],
+                result['queries']))
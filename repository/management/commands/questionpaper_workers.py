@@ -0,0 +1,41 @@
+from multiprocessing import Process
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from repository.jobs import POLL_INTERVAL, run_pending_jobs, work
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of workers that render queued question papers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int,
+            default=getattr(settings, 'QUESTIONPAPER_WORKERS', 4),
+            help='Number of worker processes.')
+        parser.add_argument(
+            '--poll-interval', type=float, default=POLL_INTERVAL,
+            help='Seconds to wait before polling an empty queue again.')
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run the queued jobs in this process and exit.')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = run_pending_jobs()
+            self.stdout.write('Generated %d question papers.' % count)
+            return
+        connections.close_all()
+        workers = [Process(target=work, args=(options['poll_interval'],))
+                   for _ in range(options['workers'])]
+        for worker in workers:
+            worker.start()
+        self.stdout.write('Started %d workers.' % len(workers))
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            for worker in workers:
+                worker.terminate()
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from repository.models import Resource
+from repository.search import index_resource
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search documents of all resources.'
+
+    def handle(self, *args, **options):
+        count = 0
+        for resource in Resource.objects.select_related('subject').iterator():
+            index_resource(resource)
+            count += 1
+        self.stdout.write('Indexed %d resources.' % count)
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from repository.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = ('Recount the subscribers, resources, questions and exams of '
+            'every subject and repair counters that have drifted.')
+
+    def handle(self, *args, **options):
+        drifted = reconcile()
+        self.stdout.write('Repaired the counters of %d subjects.' %
+                          len(drifted))
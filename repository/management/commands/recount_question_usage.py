@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from repository.models import QuestionUsage
+from repository.usage import recount_usage
+
+
+class Command(BaseCommand):
+    help = ('Rebuild the usage history of every question from the exams it '
+            'has been in.')
+
+    def handle(self, *args, **options):
+        recount_usage()
+        self.stdout.write('Recounted the usage of %d questions.' %
+                          QuestionUsage.objects.count())
@@ -0,0 +1,158 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.db import connections
+from django.template.base import Template
+from django.utils.functional import SimpleLazyObject
+
+from repository.permissions import PermissionContext
+
+logger = logging.getLogger('repository.profiling')
+logger.addHandler(logging.NullHandler())
+
+_local = threading.local()
+# Profiled requests in progress, and the Template.render they wrapped.
+_timing = {'active': 0, 'render': None}
+_timing_lock = threading.Lock()
+
+
+def fingerprint(sql):
+    """Reduce a query to its shape by replacing literal values."""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(\.\d+)?\b', '?', sql)
+    sql = re.sub(r'\(\?(, \?)*\)', '(...)', sql)
+    return ' '.join(sql.split())
+
+
+def duplicated_queries(queries):
+    """Return (fingerprint, count) pairs of queries run more than once."""
+    counts = Counter(fingerprint(query['sql']) for query in queries)
+    return [(sql, count) for sql, count in counts.most_common()
+            if count > 1]
+
+
+def new_queries(log, marker):
+    """Return the queries logged after `marker`. The log is a capped deque,
+    so positions can't be relied on."""
+    queries = []
+    for query in reversed(log):
+        if query is marker:
+            break
+        queries.append(query)
+    queries.reverse()
+    return queries
+
+
+def timed_render(render):
+    def wrapper(self, context):
+        if getattr(_local, 'template_time', None) is None or \
+                _local.depth:
+            return render(self, context)
+        _local.depth += 1
+        start = time.time()
+        try:
+            return render(self, context)
+        finally:
+            _local.template_time += time.time() - start
+            _local.depth -= 1
+    return wrapper
+
+
+def start_template_timing():
+    """Time template rendering on the current thread. Template.render is
+    only wrapped while a profiled request is in progress."""
+    with _timing_lock:
+        if not _timing['active']:
+            _timing['render'] = Template.__dict__['render']
+            Template.render = timed_render(_timing['render'])
+        _timing['active'] += 1
+    _local.template_time = 0
+    _local.depth = 0
+
+
+def stop_template_timing():
+    """Stop timing and return the seconds spent rendering."""
+    with _timing_lock:
+        _timing['active'] -= 1
+        if not _timing['active']:
+            Template.render = _timing['render']
+    elapsed = _local.template_time
+    _local.template_time = None
+    return elapsed
+
+
+class RequestProfilingMiddleware(object):
+    """Records, for a sample of requests, the view, total time, SQL queries,
+    SQL time, repeated queries and template render time. The numbers are
+    logged at DEBUG level to the repository.profiling logger and sent in a
+    Server-Timing header. REQUEST_PROFILING_SAMPLE_RATE sets the share of
+    requests profiled."""
+
+    def process_request(self, request):
+        rate = getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0)
+        if not rate or random.random() >= rate:
+            return
+        state = {}
+        for connection in connections.all():
+            log = connection.queries_log
+            state[connection.alias] = (connection.force_debug_cursor,
+                                       log[-1] if log else None)
+            connection.force_debug_cursor = True
+        request._profiling = {'start': time.time(), 'connections': state,
+                              'view': None}
+        start_template_timing()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, '_profiling'):
+            view = getattr(view_func, 'view_class', view_func)
+            request._profiling['view'] = view.__module__ + '.' + \
+                view.__name__
+
+    def process_response(self, request, response):
+        profiling = getattr(request, '_profiling', None)
+        if profiling is None:
+            return response
+        total = time.time() - profiling['start']
+        queries = []
+        for connection in connections.all():
+            if connection.alias not in profiling['connections']:
+                continue
+            force_debug_cursor, marker = \
+                profiling['connections'][connection.alias]
+            queries += new_queries(connection.queries_log, marker)
+            connection.force_debug_cursor = force_debug_cursor
+        template_time = stop_template_timing()
+        sql_time = sum(float(query['time']) for query in queries)
+
+        record = {
+            'path': request.path,
+            'method': request.method,
+            'status': response.status_code,
+            'view': profiling['view'],
+            'total_ms': round(total * 1000, 2),
+            'queries': len(queries),
+            'sql_ms': round(sql_time * 1000, 2),
+            'template_ms': round(template_time * 1000, 2),
+            'duplicated_queries': duplicated_queries(queries)[:5],
+        }
+        logger.debug(json.dumps(record))
+        response['Server-Timing'] = \
+            'total;dur=%.2f, sql;dur=%.2f;desc="%d queries", ' \
+            'template;dur=%.2f' % (record['total_ms'], record['sql_ms'],
+                                   record['queries'], record['template_ms'])
+        return response
+
+
+class PermissionMiddleware(object):
+    """Attaches the PermissionContext of the current user to the request as
+    request.permissions. It is loaded on first use."""
+
+    def process_request(self, request):
+        request.permissions = SimpleLazyObject(
+            lambda: PermissionContext(request.user))
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.2 on 2026-10-17 14:50
+from __future__ import unicode_literals
+
+from django.db import OperationalError, migrations, models
+import django.db.models.deletion
+
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE repository_resource_fts USING fts5(
+        title, category, subject, body,
+        content='repository_resourcesearchdocument',
+        content_rowid='resource_id',
+        tokenize='porter unicode61')""",
+    """CREATE TRIGGER repository_resource_fts_insert
+        AFTER INSERT ON repository_resourcesearchdocument BEGIN
+        INSERT INTO repository_resource_fts(
+            rowid, title, category, subject, body)
+        VALUES (new.resource_id, new.title, new.category, new.subject,
+                new.body);
+    END""",
+    """CREATE TRIGGER repository_resource_fts_delete
+        AFTER DELETE ON repository_resourcesearchdocument BEGIN
+        INSERT INTO repository_resource_fts(
+            repository_resource_fts, rowid, title, category, subject, body)
+        VALUES ('delete', old.resource_id, old.title, old.category,
+                old.subject, old.body);
+    END""",
+    """CREATE TRIGGER repository_resource_fts_update
+        AFTER UPDATE ON repository_resourcesearchdocument BEGIN
+        INSERT INTO repository_resource_fts(
+            repository_resource_fts, rowid, title, category, subject, body)
+        VALUES ('delete', old.resource_id, old.title, old.category,
+                old.subject, old.body);
+        INSERT INTO repository_resource_fts(
+            rowid, title, category, subject, body)
+        VALUES (new.resource_id, new.title, new.category, new.subject,
+                new.body);
+    END""",
+]
+
+POSTGRESQL_INDEX = """CREATE INDEX repository_resourcesearchdocument_fts
+    ON repository_resourcesearchdocument USING gin(to_tsvector('english',
+        title || ' ' || category || ' ' || subject || ' ' || body))"""
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        try:
+            for sql in SQLITE_FTS:
+                schema_editor.execute(sql)
+        except OperationalError:
+            # SQLite built without FTS5, searches fall back to LIKE queries.
+            pass
+    elif vendor == 'postgresql':
+        schema_editor.execute(POSTGRESQL_INDEX)
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            'DROP TABLE IF EXISTS repository_resource_fts')
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            'DROP INDEX IF EXISTS repository_resourcesearchdocument_fts')
+
+
+def index_resources(apps, schema_editor):
+    Resource = apps.get_model('repository', 'Resource')
+    ResourceSearchDocument = apps.get_model('repository',
+                                            'ResourceSearchDocument')
+    documents = [
+        ResourceSearchDocument(
+            resource_id=resource.id, title=resource.title,
+            category=resource.category.replace('_', ' '),
+            subject=resource.subject.code + ' ' + resource.subject.name)
+        for resource in Resource.objects.select_related('subject')]
+    ResourceSearchDocument.objects.bulk_create(documents)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0003_questionpaperjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceSearchDocument',
+            fields=[
+                ('resource', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='repository.Resource')),
+                ('title', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=50)),
+                ('subject', models.CharField(max_length=70)),
+                ('body', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(index_resources, migrations.RunPython.noop),
+    ]
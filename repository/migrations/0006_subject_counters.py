@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.2 on 2026-10-17 15:06
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_related(apps, schema_editor):
+    Subject = apps.get_model('repository', 'Subject')
+    related = [
+        ('subscriber_count', Subject.students.through),
+        ('resource_count', apps.get_model('repository', 'Resource')),
+        ('question_count', apps.get_model('repository', 'Question')),
+        ('exam_count', apps.get_model('repository', 'Exam')),
+    ]
+    for field, model in related:
+        counts = model.objects.values_list('subject_id').annotate(
+            Count('pk')).order_by()
+        for subject_id, count in counts:
+            Subject.objects.filter(id=subject_id).update(**{field: count})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0005_resourcetext'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='subject',
+            name='exam_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='question_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='resource_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='subject',
+            name='subscriber_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_related, migrations.RunPython.noop),
+    ]
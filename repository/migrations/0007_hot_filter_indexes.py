@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.2 on 2026-10-17 15:08
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+INDEXES = [
+    ('Profile', ['status', 'department']),
+    ('Question', ['subject', 'module', 'part', 'level']),
+    ('Resource', ['category', 'subject']),
+]
+
+
+def index_fields(apps, schema_editor, create):
+    # Django 1.9 rebuilds SQLite tables to change index_together, which
+    # leaves other tables pointing at the renamed copy on recent SQLite
+    # versions, so the indexes are created directly.
+    for model_name, field_names in INDEXES:
+        model = apps.get_model('repository', model_name)
+        fields = [model._meta.get_field(x) for x in field_names]
+        name = schema_editor._create_index_name(
+            model, [x.column for x in fields], suffix='_idx')
+        if create:
+            schema_editor.execute(schema_editor._create_index_sql(
+                model, fields, suffix='_idx'))
+        else:
+            schema_editor.execute(schema_editor.sql_delete_index % {
+                'table': schema_editor.quote_name(model._meta.db_table),
+                'name': schema_editor.quote_name(name),
+            })
+
+
+def create_indexes(apps, schema_editor):
+    index_fields(apps, schema_editor, True)
+
+
+def drop_indexes(apps, schema_editor):
+    index_fields(apps, schema_editor, False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0006_subject_counters'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunPython(create_indexes, drop_indexes),
+            ],
+            state_operations=[
+                migrations.AlterIndexTogether(
+                    name='profile',
+                    index_together=set([('status', 'department')]),
+                ),
+                migrations.AlterIndexTogether(
+                    name='question',
+                    index_together=set([('subject', 'module', 'part',
+                                         'level')]),
+                ),
+                migrations.AlterIndexTogether(
+                    name='resource',
+                    index_together=set([('category', 'subject')]),
+                ),
+            ]),
+    ]
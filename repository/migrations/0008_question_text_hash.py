@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.2 on 2026-10-17 15:20
+from __future__ import unicode_literals
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def legacy_alter_table(apps, schema_editor):
+    # Dropping the unique constraint rebuilds the question table on SQLite.
+    # Without this, recent SQLite versions point the foreign keys of other
+    # tables at the renamed copy that Django drops afterwards.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA legacy_alter_table = ON')
+
+
+def hash_questions(apps, schema_editor):
+    """Fill in text_hash, merging questions of a subject whose normalized
+    text is the same into the oldest one."""
+    Question = apps.get_model('repository', 'Question')
+    Subject = apps.get_model('repository', 'Subject')
+    Used = Question.exam.through
+    kept = {}
+    for question in Question.objects.order_by('id').iterator():
+        normalized = ' '.join(question.text.lower().split())
+        text_hash = hashlib.sha1(normalized.encode('utf-8')).hexdigest()
+        key = (question.subject_id, text_hash)
+        if key not in kept:
+            kept[key] = question.id
+            Question.objects.filter(id=question.id).update(
+                text_hash=text_hash)
+            continue
+        used = set(Used.objects.filter(
+            question_id=kept[key]).values_list('exam_id', flat=True))
+        Used.objects.filter(question_id=question.id).exclude(
+            exam_id__in=used).update(question_id=kept[key])
+        Used.objects.filter(question_id=question.id).delete()
+        Question.objects.filter(id=question.id).delete()
+        Subject.objects.filter(id=question.subject_id).update(
+            question_count=models.F('question_count') - 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0007_hot_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(legacy_alter_table, legacy_alter_table),
+        migrations.AddField(
+            model_name='question',
+            name='text_hash',
+            field=models.CharField(default='', max_length=40),
+            preserve_default=False,
+        ),
+        migrations.RunPython(hash_questions, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='question',
+            name='text',
+            field=models.CharField(max_length=5000),
+        ),
+        migrations.AlterUniqueTogether(
+            name='question',
+            unique_together=set([('subject', 'text_hash')]),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.2 on 2026-10-17 16:40
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def legacy_alter_table(apps, schema_editor):
+    # Adding a foreign key rebuilds the exam table on SQLite. Without this,
+    # recent SQLite versions point the foreign keys of other tables at the
+    # renamed copy that Django drops afterwards.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('PRAGMA legacy_alter_table = ON')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0008_question_text_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(legacy_alter_table, legacy_alter_table),
+        migrations.AddField(
+            model_name='exam',
+            name='set_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sets', to='repository.Exam'),
+        ),
+        migrations.AddField(
+            model_name='questionpaperjob',
+            name='max_overlap',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
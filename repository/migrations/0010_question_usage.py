@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.2 on 2026-10-17 15:24
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def count_usage(apps, schema_editor):
+    Question = apps.get_model('repository', 'Question')
+    QuestionUsage = apps.get_model('repository', 'QuestionUsage')
+    rows = Question.exam.through.objects.values(
+        'question_id', 'question__subject_id').annotate(
+            use_count=models.Count('exam_id'),
+            last_used=models.Max('exam__created_at')).order_by()
+    QuestionUsage.objects.bulk_create(
+        QuestionUsage(question_id=row['question_id'],
+                      subject_id=row['question__subject_id'],
+                      use_count=row['use_count'],
+                      last_used=row['last_used'])
+        for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0009_question_paper_sets'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionUsage',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='repository.Question')),
+                ('use_count', models.PositiveIntegerField()),
+                ('last_used', models.DateTimeField()),
+                ('subject', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='repository.Subject')),
+            ],
+            options={
+                'index_together': set([('subject', 'last_used')]),
+            },
+        ),
+        migrations.RunPython(count_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.9.2 on 2026-10-17 15:39
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0010_question_usage'),
+    ]
+
+    operations = [
+        # Only the model state changes. Altering the field on SQLite would
+        # rebuild the question table for nothing.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='question',
+                    name='text_hash',
+                    field=models.CharField(editable=False, max_length=40),
+                ),
+            ]),
+    ]
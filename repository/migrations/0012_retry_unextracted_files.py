@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+def forget_skipped_files(apps, schema_editor):
+    """Text of PDF and PowerPoint files was stored as empty, with the file's
+    hash, when pdfminer.six or python-pptx was missing. Drop those rows so
+    that the files are extracted again."""
+    ResourceText = apps.get_model('repository', 'ResourceText')
+    empty = ResourceText.objects.filter(text='', error='')
+    for extension in ('.pdf', '.pptx'):
+        empty.filter(resource__resourcefile__iendswith=extension).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('repository', '0011_question_text_hash_not_editable'),
+    ]
+
+    operations = [
+        migrations.RunPython(forget_skipped_files,
+                             migrations.RunPython.noop),
+    ]
@@ -1,6 +1,7 @@
 import hashlib
 import os
 
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -36,6 +37,16 @@ def set_filename(instance, filename):
     return os.path.join('resources', outfilename)
 
 
+def normalize_question(text):
+    """Question text in lower case with whitespace collapsed, so that
+    questions differing only in spacing or case are treated as the same."""
+    return u' '.join(text.lower().split())
+
+
+def question_hash(text):
+    return hashlib.sha1(normalize_question(text).encode('utf-8')).hexdigest()
+
+
 def set_profilepicturename(instance, filename):
     filenamesplit = os.path.splitext(filename)
     extension = filenamesplit[1]
@@ -60,6 +71,10 @@ class Profile(models.Model):
     bloodgroup = models.CharField(max_length=5)
     phone = models.CharField(max_length=15)
 
+    class Meta:
+        # Staff listings filter profiles by status.
+        index_together = [('status', 'department')]
+
     def __unicode__(self):
         return "Profile of " + self.user.username
 
@@ -74,6 +89,11 @@ class Subject(models.Model):
     staff = models.ManyToManyField(User, related_name="teachingsubjects")
     students = models.ManyToManyField(User, related_name="subscribedsubjects")
     description = models.TextField(max_length=5000)
+    # Maintained by repository.counters, repaired by reconcile_counters.
+    subscriber_count = models.PositiveIntegerField(default=0)
+    resource_count = models.PositiveIntegerField(default=0)
+    question_count = models.PositiveIntegerField(default=0)
+    exam_count = models.PositiveIntegerField(default=0)
 
     def __unicode__(self):
         return self.name
@@ -86,6 +106,10 @@ class Resource(models.Model):
     resourcefile = models.FileField(upload_to=set_filename)
     uploader = models.ForeignKey(User)
 
+    class Meta:
+        # Resource listings filter by category.
+        index_together = [('category', 'subject')]
+
     def __unicode__(self):
         return self.title
 
@@ -96,6 +120,10 @@ class Exam(models.Model):
     time = models.CharField(max_length=10)
     subject = models.ForeignKey(Subject)
     questionpaper = models.FileField(upload_to=set_questionpapername)
+    # The first exam of a batch of question paper sets; its job generates
+    # the papers of every set.
+    set_of = models.ForeignKey('self', null=True, blank=True,
+                               related_name='sets')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -104,7 +132,10 @@ class Exam(models.Model):
 
 
 class Question(models.Model):
-    text = models.CharField(max_length=5000, unique=True)
+    text = models.CharField(max_length=5000)
+    # question_hash() of the text, filled in by save(). Set it yourself
+    # when using bulk_create().
+    text_hash = models.CharField(max_length=40, editable=False)
     module = models.IntegerField()
     part = models.CharField(max_length=10)
     co = models.CharField(max_length=10)
@@ -112,5 +143,85 @@ class Question(models.Model):
     exam = models.ManyToManyField(Exam)
     subject = models.ForeignKey(Subject)
 
+    class Meta:
+        # Question pools are built and drawn per (module, part, level)
+        # within a subject.
+        index_together = [('subject', 'module', 'part', 'level')]
+        unique_together = [('subject', 'text_hash')]
+
     def __unicode__(self):
         return self.text
+
+    def clean(self):
+        # Forms leave text_hash out of the unique check, since it isn't
+        # editable, so check for the same question here.
+        self.text_hash = question_hash(self.text)
+        if self.subject_id is not None and Question.objects.filter(
+                subject_id=self.subject_id, text_hash=self.text_hash
+        ).exclude(pk=self.pk).exists():
+            raise ValidationError(
+                {'text': 'The subject already has this question.'})
+
+    def save(self, *args, **kwargs):
+        self.text_hash = question_hash(self.text)
+        super(Question, self).save(*args, **kwargs)
+
+
+class QuestionUsage(models.Model):
+    """How often and how recently a question has been in an exam, kept up
+    to date by repository.usage. Questions never used have no row."""
+    question = models.OneToOneField(Question, primary_key=True,
+                                    related_name='usage')
+    subject = models.ForeignKey(Subject)
+    use_count = models.PositiveIntegerField()
+    # Creation time of the latest exam with the question.
+    last_used = models.DateTimeField()
+
+    class Meta:
+        index_together = [('subject', 'last_used')]
+
+    def __unicode__(self):
+        return "Usage of " + self.question.text
+
+
+class QuestionPaperJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    exam = models.OneToOneField(Exam, related_name='job')
+    criteria = models.TextField()
+    # How many questions each set of a batch may share with the others.
+    max_overlap = models.PositiveIntegerField(default=0)
+    status = models.CharField(max_length=10, default=PENDING, db_index=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return "Question paper job of " + self.exam.name
+
+
+class ResourceSearchDocument(models.Model):
+    resource = models.OneToOneField(Resource, primary_key=True,
+                                    related_name='search_document')
+    title = models.CharField(max_length=100)
+    category = models.CharField(max_length=50)
+    subject = models.CharField(max_length=70)
+    body = models.TextField(blank=True)
+
+    def __unicode__(self):
+        return "Search document of " + self.title
+
+
+class ResourceText(models.Model):
+    resource = models.OneToOneField(Resource, primary_key=True,
+                                    related_name='text')
+    content_hash = models.CharField(max_length=40)
+    text = models.TextField(blank=True)
+    error = models.TextField(blank=True)
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    def __unicode__(self):
+        return "Text of " + self.resource.title
@@ -0,0 +1,140 @@
+"""Keyset pagination.
+
+A page is fetched by filtering on the sort key of the row it starts after
+(or ends before), rather than with an offset, so every page costs the same
+however deep it is. The sort key of a boundary row is passed between
+requests as an opaque cursor string."""
+import base64
+import binascii
+import json
+from functools import reduce
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values)).rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the key values of a cursor, or raise ValueError."""
+    try:
+        cursor = str(cursor)
+        values = json.loads(base64.urlsafe_b64decode(
+            cursor + '=' * (-len(cursor) % 4)))
+    except (TypeError, UnicodeError, binascii.Error):
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def key_field(queryset, name):
+    """The model field, or the output field of an annotation, that the sort
+    key `name` is read from."""
+    if name in queryset.query.annotations:
+        return queryset.query.annotations[name].output_field
+    model = queryset.model
+    names = name.split('__')
+    for related in names[:-1]:
+        model = model._meta.get_field(related).related_model
+    return model._meta.get_field(names[-1])
+
+
+def clean_key(queryset, ordering, values):
+    """Check the values of a decoded cursor against the fields of `ordering`
+    and convert them to Python values. A cursor is handed back by the
+    client, so it may have been tampered with; raises ValueError."""
+    if len(values) != len(ordering):
+        raise ValueError('Invalid cursor')
+    cleaned = []
+    for field, value in zip(ordering, values):
+        if isinstance(value, bool) or \
+                not isinstance(value, (int, long, float, basestring)):
+            raise ValueError('Invalid cursor')
+        try:
+            cleaned.append(
+                key_field(queryset, field.lstrip('-')).to_python(value))
+        except ValidationError:
+            raise ValueError('Invalid cursor')
+    return cleaned
+
+
+def key_of(obj, ordering):
+    values = []
+    for field in ordering:
+        value = obj
+        for name in field.lstrip('-').split('__'):
+            value = getattr(value, name)
+        values.append(value)
+    return values
+
+
+def reverse_ordering(ordering):
+    return [x[1:] if x.startswith('-') else '-' + x for x in ordering]
+
+
+def after_filter(ordering, values):
+    """Q matching the rows that come after `values` in `ordering`. For
+    (a, b) that is a > x OR (a = x AND b > y)."""
+    if len(values) != len(ordering):
+        raise ValueError('Invalid cursor')
+    alternatives = []
+    for i, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = '__lt' if field.startswith('-') else '__gt'
+        condition = dict((ordering[j].lstrip('-'), values[j])
+                         for j in range(i))
+        condition[name + lookup] = values[i]
+        alternatives.append(Q(**condition))
+    return reduce(lambda x, y: x | y, alternatives)
+
+
+class KeysetPage(object):
+
+    def __init__(self, object_list, ordering, has_next, has_previous):
+        self.object_list = object_list
+        self.ordering = ordering
+        self.has_next = has_next
+        self.has_previous = has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    @property
+    def next_cursor(self):
+        if self.has_next and self.object_list:
+            return encode_cursor(key_of(self.object_list[-1], self.ordering))
+
+    @property
+    def previous_cursor(self):
+        if self.has_previous and self.object_list:
+            return encode_cursor(key_of(self.object_list[0], self.ordering))
+
+
+def paginate(queryset, ordering, per_page, after=None, before=None):
+    """Return the KeysetPage of `queryset`, sorted by `ordering`, that
+    starts after the cursor `after` or ends before the cursor `before`.
+    The last field of `ordering` must be unique. Raises ValueError for a
+    malformed cursor."""
+    if before is not None:
+        values = clean_key(queryset, ordering, decode_cursor(before))
+        rows = list(queryset.filter(
+            after_filter(reverse_ordering(ordering), values)
+        ).order_by(*reverse_ordering(ordering))[:per_page + 1])
+        has_previous = len(rows) > per_page
+        return KeysetPage(rows[:per_page][::-1], ordering, True,
+                          has_previous)
+    if after is not None:
+        values = clean_key(queryset, ordering, decode_cursor(after))
+        queryset = queryset.filter(after_filter(ordering, values))
+    rows = list(queryset.order_by(*ordering)[:per_page + 1])
+    return KeysetPage(rows[:per_page], ordering, len(rows) > per_page,
+                      after is not None)
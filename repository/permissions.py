@@ -0,0 +1,56 @@
+from django.utils.functional import cached_property
+
+from repository.models import Profile, Subject
+
+STAFF_STATUSES = ('hod', 'teacher')
+
+
+class PermissionContext(object):
+    """Role of the current user, loaded once per request. Checks against a
+    subject only compare ids, so they never touch the database."""
+
+    def __init__(self, user):
+        self.user = user
+        self.is_authenticated = user.is_authenticated()
+        self.username = user.username if self.is_authenticated else ''
+        self.status = None
+        self.department_id = None
+        self.department = None
+        if self.is_authenticated:
+            profile = Profile.objects.select_related('department').filter(
+                user_id=user.pk).first()
+            if profile is not None:
+                # Templates read user.profile, so reuse the loaded row.
+                user.profile = profile
+                self.status = profile.status
+                self.department_id = profile.department_id
+                self.department = profile.department
+
+    @property
+    def is_hod(self):
+        return self.status == 'hod'
+
+    @property
+    def is_hod_or_teacher(self):
+        return self.status in STAFF_STATUSES
+
+    def is_hod_of(self, subject):
+        return self.is_hod and self.department_id == subject.department_id
+
+    def is_staff_of(self, subject):
+        return self.is_hod_or_teacher and \
+            self.department_id == subject.department_id
+
+    @cached_property
+    def teaching_subject_ids(self):
+        if not self.is_authenticated:
+            return set()
+        return set(Subject.staff.through.objects.filter(
+            user_id=self.user.pk).values_list('subject_id', flat=True))
+
+    @cached_property
+    def subscribed_subject_ids(self):
+        if not self.is_authenticated:
+            return set()
+        return set(Subject.students.through.objects.filter(
+            user_id=self.user.pk).values_list('subject_id', flat=True))
@@ -0,0 +1,124 @@
+from collections import namedtuple
+from contextlib import closing
+from itertools import islice
+from zipfile import BadZipfile
+
+from django.db import transaction
+from openpyxl import load_workbook
+from openpyxl.utils.exceptions import InvalidFileException
+
+from repository.counters import adjust
+from repository.models import Question, question_hash
+from repository.questionpool import invalidate_pool
+
+IMPORTED = 'imported'
+DUPLICATE = 'duplicate'
+INVALID = 'invalid'
+
+BATCH_SIZE = 500
+
+# Raised when an upload isn't a readable excel workbook.
+WORKBOOK_ERRORS = (InvalidFileException, BadZipfile, IOError)
+
+ImportedRow = namedtuple('ImportedRow', ['row', 'status', 'message'])
+
+
+def is_number(value):
+    try:
+        int(value)
+    except (TypeError, ValueError):
+        return False
+    return True
+
+
+def read_rows(qbfile):
+    """Stream (row number, values) pairs from the first worksheet of a
+    question bank. Columns are: serial number, question text, module, course
+    outcome, part and level. A heading row at the top, one with neither a
+    serial number nor a module number, is skipped, as are blank rows."""
+    workbook = load_workbook(filename=qbfile, read_only=True)
+    try:
+        for number, row in enumerate(workbook.worksheets[0].rows, 1):
+            values = [cell.value for cell in row]
+            values += [None] * (6 - len(values))
+            if not any(to_text(x) for x in values):
+                continue
+            if number == 1 and not is_number(values[0]) and \
+                    not is_number(values[2]):
+                continue
+            yield number, values
+    finally:
+        workbook.close()
+
+
+def to_text(value):
+    if value is None:
+        return u''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return unicode(value).strip()
+
+
+def validate_row(values):
+    """Return the Question fields of a row, or raise ValueError."""
+    text = to_text(values[1])
+    if not text:
+        raise ValueError('Question text is empty')
+    if len(text) > 5000:
+        raise ValueError('Question text is longer than 5000 characters')
+    try:
+        module = int(values[2])
+    except (TypeError, ValueError):
+        raise ValueError('Module must be a number')
+    fields = {'text': text, 'module': module}
+    for name, value in (('co', values[3]), ('part', values[4]),
+                        ('level', values[5])):
+        value = to_text(value)
+        if not value or len(value) > 10:
+            raise ValueError('Invalid value for ' + name)
+        fields[name] = value
+    return fields
+
+
+def import_question_bank(qbfile, subject, batch_size=BATCH_SIZE):
+    """Import the questions of an excel question bank into a subject.
+
+    Rows are validated and inserted in batches inside a single transaction, so
+    a failure leaves no partial import behind. A question is a duplicate when
+    the subject already has one with the same text, ignoring case and
+    spacing. Returns a list of ImportedRow, one per spreadsheet row."""
+    report = []
+    seen = set()
+    rows = read_rows(qbfile)
+    with closing(rows), transaction.atomic():
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            candidates = []
+            for number, values in batch:
+                try:
+                    candidates.append((number, validate_row(values)))
+                except ValueError as e:
+                    report.append(ImportedRow(number, INVALID, str(e)))
+            for _, fields in candidates:
+                fields['text_hash'] = question_hash(fields['text'])
+            existing = set(Question.objects.filter(
+                subject=subject,
+                text_hash__in=[fields['text_hash'] for _, fields in candidates]
+            ).values_list('text_hash', flat=True))
+            questions = []
+            for number, fields in candidates:
+                text_hash = fields['text_hash']
+                if text_hash in existing or text_hash in seen:
+                    report.append(ImportedRow(number, DUPLICATE,
+                                              'Question already exists'))
+                    continue
+                seen.add(text_hash)
+                questions.append(Question(subject=subject, **fields))
+                report.append(ImportedRow(number, IMPORTED, ''))
+            Question.objects.bulk_create(questions)
+            adjust('question_count', [subject.id], len(questions))
+    invalidate_pool(subject.id)
+    report.sort(key=lambda x: x.row)
+    return report
@@ -0,0 +1,316 @@
+import re
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
+from multiprocessing import Pool
+from xml.sax.saxutils import escape
+from zipfile import ZIP_DEFLATED, ZipFile
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from docx import Document
+from docx.enum.style import WD_STYLE_TYPE
+from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.shared import Pt
+
+from repository.blueprint import select_questions
+from repository.models import Question
+from repository.questionpool import get_pool, invalidate_pool
+from repository.usage import recount_usage
+
+INSTITUTE = 'Adi Shankara Institute of Engineering and Technology'
+PARTS = ['Part A', 'Part B', 'Part C']
+HEADING_STYLE = 'Paper Heading'
+PART_STYLE = 'Paper Part'
+
+DOCUMENT_PART = 'word/document.xml'
+PARAGRAPH = u'<w:p>%s<w:r><w:t xml:space="preserve">%s</w:t></w:r></w:p>'
+STYLE_PROPERTIES = u'<w:pPr><w:pStyle w:val="%s"/></w:pPr>'
+# Characters that XML 1.0 does not allow.
+INVALID_XML = re.compile(u'[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+_template = None
+
+
+def build_template():
+    """Build the parts of a question paper that are the same for every
+    exam: the paragraph styles and the institute heading. Returns the
+    document as bytes."""
+    document = Document()
+    styles = document.styles
+    title = styles.add_style('Paper Title', WD_STYLE_TYPE.PARAGRAPH)
+    title.base_style = styles['Normal']
+    title.font.name = 'Times New Roman'
+    title.font.size = Pt(14)
+    title.font.bold = True
+    title.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    heading = styles.add_style(HEADING_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+    heading.base_style = styles['Normal']
+    heading.paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
+    part = styles.add_style(PART_STYLE, WD_STYLE_TYPE.PARAGRAPH)
+    part.base_style = heading
+    part.font.bold = True
+    document.add_paragraph(INSTITUTE, style=title)
+    output = BytesIO()
+    document.save(output)
+    return output.getvalue()
+
+
+class PaperTemplate(object):
+    """The parts of the template's .docx package, kept in memory, with
+    word/document.xml split where the paragraphs of an exam go. Rendering a
+    paper only writes the parts back out around the new paragraphs, instead
+    of parsing and serializing the whole document."""
+
+    def __init__(self, content):
+        package = ZipFile(BytesIO(content))
+        try:
+            self.parts = [(info, package.read(info))
+                          for info in package.infolist()]
+        finally:
+            package.close()
+        document = dict((info.filename, data)
+                        for info, data in self.parts)[DOCUMENT_PART]
+        # The body ends with the properties of its last section.
+        split = document.rindex('<w:sectPr')
+        self.head, self.tail = document[:split], document[split:]
+
+    def render(self, paragraphs):
+        """Return the .docx bytes of the template followed by
+        `paragraphs`, a list of (text, style name) pairs."""
+        body = u''.join(
+            PARAGRAPH % (STYLE_PROPERTIES % style.replace(' ', '')
+                         if style else '',
+                         escape(INVALID_XML.sub(u'', unicode(text))))
+            for text, style in paragraphs)
+        output = BytesIO()
+        package = ZipFile(output, 'w', ZIP_DEFLATED)
+        try:
+            for info, data in self.parts:
+                if info.filename == DOCUMENT_PART:
+                    data = self.head + body.encode('utf-8') + self.tail
+                package.writestr(info, data)
+        finally:
+            package.close()
+        return output.getvalue()
+
+
+def get_template():
+    """The question paper template, built once per process."""
+    global _template
+    if _template is None:
+        _template = PaperTemplate(build_template())
+    return _template
+
+
+def render_paper(subject, questions, exam, marks, time):
+    """Render a question paper in memory and return the .docx bytes.
+    `questions` maps 'Part A', 'Part B' and 'Part C' to lists of
+    questions."""
+    paragraphs = [
+        (exam.name, HEADING_STYLE),
+        (subject.name, HEADING_STYLE),
+        ("Marks : " + str(marks) + " " * 100 + "Time : " + str(time), None),
+    ]
+    for part in PARTS:
+        if questions[part]:
+            paragraphs.append((part, PART_STYLE))
+            paragraphs += [(str(count) + ". " + question.text, None)
+                           for count, question in
+                           enumerate(questions[part], 1)]
+    return get_template().render(paragraphs)
+
+
+def _render_paper(args):
+    return render_paper(*args)
+
+
+def render_papers(papers, processes=None):
+    """Render a list of render_paper() argument tuples and return the
+    .docx bytes of each, in a pool of processes when there are several."""
+    if processes is None:
+        processes = getattr(settings, 'QUESTIONPAPER_RENDER_PROCESSES', 4)
+    processes = min(processes, len(papers))
+    if processes <= 1:
+        return [render_paper(*x) for x in papers]
+    pool = Pool(processes)
+    try:
+        return pool.map(_render_paper, papers)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def paper_filename(subject):
+    today = datetime.today()
+    return subject.name.replace(' ', '_') + '_' + \
+        str(today.day) + str(today.month) + str(today.year) + '.docx'
+
+
+def make_document(subject, questions, exam, marks, time):
+    """Render the question paper of an exam as a .docx file and save it to
+    exam.questionpaper"""
+    content = render_paper(subject, questions, exam, marks, time)
+    exam.questionpaper.save(paper_filename(subject), ContentFile(content))
+    return '/uploads/' + exam.questionpaper.url
+
+
+def check_criteria(pool, criteria):
+    """Validate a list of (module, part, level, count) criteria of one
+    question paper against a question pool. Returns an OrderedDict mapping
+    (module, part, level) to the number of questions to draw, with repeated
+    criteria merged, or raises ValueError naming every criterion that
+    cannot be met."""
+    merged = OrderedDict()
+    errors = []
+    for module, part, level, count in criteria:
+        try:
+            key = pool.key(module, part, level)
+            valid = 'Part ' + part in PARTS and int(count) > 0
+        except (TypeError, ValueError):
+            valid = False
+        if not valid:
+            errors.append('Invalid criterion: module %s, part %s, %s, %s '
+                          'questions' % (module, part, level, count))
+            continue
+        count = int(count)
+        merged[key] = merged.get(key, 0) + count
+    for (module, part, level), count in merged.items():
+        available = pool.count(module, part, level)
+        if available < count:
+            errors.append('Module %d, part %s, %s: %d questions asked for, '
+                          '%d available' % (module, part, level, count,
+                                            available))
+    if errors:
+        raise ValueError('; '.join(errors))
+    return merged
+
+
+def attach_questions(exam_questions):
+    """Replace the questions of exams with one insert, and recount the
+    usage of the questions involved. `exam_questions` is a list of (exam,
+    question ids) pairs."""
+    Used = Question.exam.through
+    previous = Used.objects.filter(
+        exam_id__in=[exam.id for exam, _ in exam_questions])
+    question_ids = list(previous.values_list('question_id', flat=True))
+    if question_ids:
+        previous.delete()
+    Used.objects.bulk_create([Used(exam_id=exam.id, question_id=x)
+                              for exam, ids in exam_questions for x in ids])
+    recount_usage(question_ids + [x for _, ids in exam_questions
+                                  for x in ids])
+
+
+def fetch_questions(subject, draw):
+    """Make a draw of question ids and fetch the questions. `draw` is
+    called with the subject's question pool and returns a list of dicts
+    mapping parts to ids. A question deleted after the pool was cached is
+    only noticed here, so the pool is then rebuilt and the draw made once
+    more. Returns the selections and a dict of the questions by id, or
+    raises ValueError."""
+    for _ in range(2):
+        selections = draw(get_pool(subject.id))
+        question_ids = set(x for selected in selections
+                           for ids in selected.values() for x in ids)
+        question_objects = Question.objects.in_bulk(question_ids)
+        if len(question_objects) == len(question_ids):
+            return selections, question_objects
+        invalidate_pool(subject.id)
+    raise ValueError('%d of the drawn questions no longer exist' %
+                     (len(question_ids) - len(question_objects)))
+
+
+def draw_one(pool, criteria):
+    selected_ids = {'Part A': [], 'Part B': [], 'Part C': []}
+    for (module, part, level), count in check_criteria(pool,
+                                                       criteria).items():
+        selected_ids["Part " + part] += pool.draw(module, part, level, count)
+    return selected_ids
+
+
+def create_qp_dataset(subject, exam, totalmarks, time, criteria):
+    """Populates the dataset needed to generate a question paper. Invokes
+    make_document() method"""
+    (selected_ids,), question_objects = fetch_questions(
+        subject, lambda pool: [draw_one(pool, criteria)])
+    questions = dict((part, [question_objects[x] for x in ids])
+                     for part, ids in selected_ids.items())
+    with transaction.atomic():
+        attach_questions([(exam, list(question_objects))])
+        # Saving the paper is the only save of the exam.
+        path = make_document(subject, questions, exam, totalmarks, time)
+    return 1, path
+
+
+def draw_sets(pool, criteria, sets, max_overlap=0):
+    """Draw the question ids of `sets` question papers from one question
+    pool. The papers share no questions when the pool is large enough;
+    otherwise each may share up to `max_overlap` questions with the others.
+    Returns one dict per paper mapping parts to question ids, or raises
+    ValueError when the criteria cannot be met."""
+    selections = [{'Part A': [], 'Part B': [], 'Part C': []}
+                  for _ in range(sets)]
+    shared = [0] * sets
+    for (module, part, level), count in check_criteria(pool,
+                                                       criteria).items():
+        draws = pool.draw_sets(module, part, level, count, sets)
+        for i, (ids, common) in enumerate(draws):
+            selections[i]['Part ' + part] += ids
+            shared[i] += common
+    if max(shared) > max_overlap:
+        raise ValueError('Not enough questions for %d sets: a set would '
+                         'share %d questions with the others' %
+                         (sets, max(shared)))
+    return selections
+
+
+def assemble_papers(subject, exams, draw):
+    """Attach the selected questions to each exam and save its question
+    paper. `draw` makes the selections, as for fetch_questions(), one per
+    exam. The questions of every exam are fetched together and the papers
+    rendered in parallel."""
+    selections, question_objects = fetch_questions(subject, draw)
+    papers = []
+    for exam, selected in zip(exams, selections):
+        questions = dict((part, [question_objects[x] for x in ids])
+                         for part, ids in selected.items())
+        papers.append((subject, questions, exam, exam.totalmarks, exam.time))
+    contents = render_papers(papers)
+    with transaction.atomic():
+        attach_questions([(exam, [x for ids in selected.values()
+                                  for x in ids])
+                          for exam, selected in zip(exams, selections)])
+        for exam, content in zip(exams, contents):
+            exam.questionpaper.save(paper_filename(subject),
+                                    ContentFile(content))
+    return exams
+
+
+def create_qp_sets(subject, exams, criteria, max_overlap=0):
+    """Generate the question papers of a batch of exams, one set each, from
+    a single draw of the subject's question pool."""
+    return assemble_papers(subject, exams, lambda pool: draw_sets(
+        pool, criteria, len(exams), max_overlap))
+
+
+def select_sets(subject, blueprint, sets):
+    """Select the question ids of `sets` question papers for a blueprint.
+    Each set is solved leaving out the questions of the sets before it, so
+    the sets share no questions. Raises ValueError when they cannot all be
+    selected."""
+    selections = []
+    used = set()
+    for _ in range(sets):
+        selected = select_questions(subject, blueprint, used)
+        used.update(x for ids in selected.values() for x in ids)
+        selections.append(selected)
+    return selections
+
+
+def create_qp_from_blueprint(subject, exams, blueprint):
+    """Generate the question papers of one or more exams from a
+    blueprint."""
+    return assemble_papers(subject, exams, lambda pool: select_sets(
+        subject, blueprint, len(exams)))
@@ -0,0 +1,87 @@
+import random
+from array import array
+
+from django.core.cache import cache
+
+from repository.models import Question
+
+POOL_CACHE_KEY = 'questionpool:2:%s'
+
+
+class QuestionPool(object):
+    """Index of a subject's question ids, bucketed by (module, part, level).
+
+    Only ids are kept, in compact arrays, so that drawing questions for a
+    paper never loads Question objects until the final fetch. Each bucket
+    is also split by course outcome, in `cells`, for the blueprint
+    solver."""
+
+    def __init__(self, cells):
+        self.cells = cells
+        self.buckets = {}
+        for (module, part, level, co), ids in cells.items():
+            key = (module, part, level)
+            if key not in self.buckets:
+                self.buckets[key] = array('l')
+            self.buckets[key].extend(ids)
+
+    @staticmethod
+    def key(module, part, level):
+        return (int(module), part, level)
+
+    @classmethod
+    def build(cls, subject_id):
+        """Build the index of a subject with a single query."""
+        cells = {}
+        rows = Question.objects.filter(subject_id=subject_id).values_list(
+            'id', 'module', 'part', 'level', 'co')
+        for question_id, module, part, level, co in rows.iterator():
+            key = cls.key(module, part, level) + (co,)
+            if key not in cells:
+                cells[key] = array('l')
+            cells[key].append(question_id)
+        return cls(cells)
+
+    def count(self, module, part, level):
+        return len(self.buckets.get(self.key(module, part, level), ()))
+
+    def draw(self, module, part, level, count):
+        """Return up to `count` random question ids from a bucket."""
+        ids = self.buckets.get(self.key(module, part, level), ())
+        if count >= len(ids):
+            return list(ids)
+        return random.sample(ids, count)
+
+    def draw_sets(self, module, part, level, count, sets):
+        """Draw `sets` selections of up to `count` question ids from a
+        bucket, sharing as few questions between selections as the bucket
+        allows. Returns a list of (ids, shared) pairs, where `shared` is the
+        number of ids the selection has in common with the others."""
+        ids = list(self.buckets.get(self.key(module, part, level), ()))
+        count = min(count, len(ids))
+        random.shuffle(ids)
+        selections = []
+        for i in range(sets):
+            # Deal the bucket out like cards; each set tops up what it is
+            # short from the questions dealt to the others.
+            own = ids[i::sets][:count]
+            shared = count - len(own)
+            if shared:
+                chosen = set(own)
+                own += random.sample([x for x in ids if x not in chosen],
+                                     shared)
+            selections.append((own, shared))
+        return selections
+
+
+def get_pool(subject_id):
+    """Return the question pool of a subject, building it if needed."""
+    pool = cache.get(POOL_CACHE_KEY % subject_id)
+    if pool is None:
+        pool = QuestionPool.build(subject_id)
+        cache.set(POOL_CACHE_KEY % subject_id, pool, None)
+    return pool
+
+
+def invalidate_pool(subject_id):
+    cache.delete(POOL_CACHE_KEY % subject_id)
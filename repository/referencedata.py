@@ -0,0 +1,55 @@
+"""Departments, subjects and resource types used to fill forms and menus.
+
+Each process keeps its own copy of the lists. Before a list is used its
+version is read from the cache, which settings.CACHES shares between
+processes, so a change made in one process reaches the others on their
+next request."""
+from collections import OrderedDict
+
+from repository.caching import bump_version, get_version
+from repository.models import Department, Subject
+
+REFERENCE_NAMESPACE = 'reference:%s'
+
+# Resource category stored in the database, and the name shown for it. The
+# name, with spaces replaced by underscores, is also used in /type/ URLs.
+RESOURCE_TYPES = OrderedDict([
+    ('presentation', 'Presentation'),
+    ('paper_publication', 'Paper Publication'),
+    ('subject_note', 'Subject Note'),
+    ('project_thesis', 'Project Thesis'),
+    ('seminar_report', 'Seminar Report'),
+    ('university_question_paper', 'Previous Question Paper'),
+])
+
+RESOURCE_CATEGORIES = OrderedDict(
+    (name, category) for category, name in RESOURCE_TYPES.items())
+
+LOADERS = {
+    'departments': lambda: list(Department.objects.order_by('name')),
+    'subjects': lambda: list(Subject.objects.order_by('name')),
+}
+
+_loaded = {}
+
+
+def get_reference(name):
+    """Return the named list, loading it again if it changed since this
+    process last loaded it."""
+    version = get_version(REFERENCE_NAMESPACE % name)
+    loaded = _loaded.get(name)
+    if loaded is None or loaded[0] != version:
+        loaded = _loaded[name] = (version, LOADERS[name]())
+    return loaded[1]
+
+
+def invalidate_reference(name):
+    bump_version(REFERENCE_NAMESPACE % name)
+
+
+def get_departments():
+    return get_reference('departments')
+
+
+def get_subjects():
+    return get_reference('subjects')
@@ -0,0 +1,140 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+
+from repository.models import Resource, ResourceSearchDocument
+
+FTS_TABLE = 'repository_resource_fts'
+
+# Matches are ranked higher in the title than in the subject, category or
+# the text of the file.
+SQLITE_RANK = 'bm25(repository_resource_fts, 10.0, 2.0, 4.0, 1.0)'
+
+POSTGRESQL_DOCUMENT = ("to_tsvector('english', title || ' ' || category "
+                       "|| ' ' || subject || ' ' || body)")
+
+_fts_tables = {}
+
+
+def get_terms(query):
+    return re.findall(r'\w+', query, re.UNICODE)
+
+
+def has_fts_table():
+    """Whether the SQLite FTS5 table exists. It is missing when SQLite was
+    built without FTS5."""
+    database = connection.settings_dict['NAME']
+    if database not in _fts_tables:
+        _fts_tables[database] = \
+            FTS_TABLE in connection.introspection.table_names()
+    return _fts_tables[database]
+
+
+def index_resource(resource, body=None):
+    """Add or refresh the search document of a resource. The extracted text
+    of the file is kept unless a new `body` is given."""
+    fields = {
+        'title': resource.title,
+        'category': resource.category.replace('_', ' '),
+        'subject': resource.subject.code + ' ' + resource.subject.name,
+    }
+    if body is not None:
+        fields['body'] = body
+    ResourceSearchDocument.objects.update_or_create(resource_id=resource.id,
+                                                    defaults=fields)
+
+
+def index_subject(subject):
+    """Refresh the subject name in the search documents of its
+    resources."""
+    ResourceSearchDocument.objects.filter(
+        resource__subject_id=subject.id).update(
+            subject=subject.code + ' ' + subject.name)
+
+
+class SearchResults(object):
+    """Ranked search results for a query. Slicing fetches only the requested
+    window of resources, so this can be handed to a Paginator."""
+
+    def __init__(self, query):
+        self.query = query
+        self.terms = get_terms(query)
+        self.vendor = connection.vendor
+        if self.vendor == 'sqlite' and not has_fts_table():
+            self.vendor = None
+        self._count = None
+
+    def fallback_queryset(self):
+        documents = ResourceSearchDocument.objects.all()
+        for term in self.terms:
+            documents = documents.filter(
+                Q(title__icontains=term) | Q(category__icontains=term) |
+                Q(subject__icontains=term) | Q(body__icontains=term))
+        return documents.order_by('-resource_id')
+
+    def sqlite_match(self):
+        return ' '.join('"%s"*' % term for term in self.terms)
+
+    def count(self):
+        if self._count is None:
+            if not self.terms:
+                self._count = 0
+            elif self.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT COUNT(*) FROM repository_resource_fts '
+                        'WHERE repository_resource_fts MATCH %s',
+                        [self.sqlite_match()])
+                    self._count = cursor.fetchone()[0]
+            elif self.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        'SELECT COUNT(*) FROM '
+                        'repository_resourcesearchdocument WHERE ' +
+                        POSTGRESQL_DOCUMENT +
+                        " @@ plainto_tsquery('english', %s)",
+                        [' '.join(self.terms)])
+                    self._count = cursor.fetchone()[0]
+            else:
+                self._count = self.fallback_queryset().count()
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def ids(self, offset, limit):
+        if not self.terms:
+            return []
+        if self.vendor == 'sqlite':
+            sql = ('SELECT rowid FROM repository_resource_fts '
+                   'WHERE repository_resource_fts MATCH %s '
+                   'ORDER BY ' + SQLITE_RANK + ' LIMIT %s OFFSET %s')
+            params = [self.sqlite_match(), limit, offset]
+        elif self.vendor == 'postgresql':
+            sql = ('SELECT resource_id FROM '
+                   'repository_resourcesearchdocument WHERE ' +
+                   POSTGRESQL_DOCUMENT +
+                   " @@ plainto_tsquery('english', %s) ORDER BY ts_rank(" +
+                   POSTGRESQL_DOCUMENT +
+                   ", plainto_tsquery('english', %s)) DESC "
+                   "LIMIT %s OFFSET %s")
+            terms = ' '.join(self.terms)
+            params = [terms, terms, limit, offset]
+        else:
+            return list(self.fallback_queryset().values_list(
+                'resource_id', flat=True)[offset:offset + limit])
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def __getitem__(self, window):
+        if not isinstance(window, slice):
+            return self[window:window + 1][0]
+        offset = window.start or 0
+        limit = (window.stop if window.stop is not None
+                 else self.count()) - offset
+        ids = self.ids(offset, max(limit, 0))
+        resources = Resource.objects.select_related(
+            'subject', 'uploader').in_bulk(ids)
+        return [resources[x] for x in ids if x in resources]
@@ -0,0 +1,162 @@
+from django.contrib.auth.models import User
+from django.db.models import Q
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from repository.caching import bump_version, subject_namespace
+from repository.counters import (COUNTERS, adjust, invalidate_category_counts,
+                                 recount)
+from repository.models import (Department, Exam, Profile, Question, Resource,
+                               Subject)
+from repository.permissions import STAFF_STATUSES
+from repository.questionpool import invalidate_pool
+from repository.referencedata import RESOURCE_TYPES, invalidate_reference
+from repository.search import index_resource, index_subject
+from repository.staff import STAFF_NAMESPACE
+from repository.usage import recount_usage
+
+COUNTER_FIELDS = dict((model, field) for field, model in COUNTERS)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_delete, sender=Question)
+def question_changed(sender, instance, **kwargs):
+    invalidate_pool(instance.subject_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Resource)
+@receiver(post_save, sender=Exam)
+def counted_row_saved(sender, instance, created, **kwargs):
+    if created:
+        adjust(COUNTER_FIELDS[sender], [instance.subject_id], 1)
+
+
+@receiver(post_delete, sender=Question)
+@receiver(post_delete, sender=Resource)
+@receiver(post_delete, sender=Exam)
+def counted_row_deleted(sender, instance, **kwargs):
+    adjust(COUNTER_FIELDS[sender], [instance.subject_id], -1)
+
+
+@receiver(post_save, sender=Resource)
+def resource_saved(sender, instance, created, **kwargs):
+    index_resource(instance)
+    bump_version(subject_namespace(instance.subject_id))
+    # The category of an existing resource may have changed.
+    invalidate_category_counts([instance.category] if created
+                               else RESOURCE_TYPES)
+
+
+@receiver(post_delete, sender=Resource)
+def resource_deleted(sender, instance, **kwargs):
+    bump_version(subject_namespace(instance.subject_id))
+    invalidate_category_counts([instance.category])
+
+
+@receiver(post_save, sender=Subject)
+def subject_saved(sender, instance, created, **kwargs):
+    invalidate_reference('subjects')
+    if not created:
+        index_subject(instance)
+        bump_version(subject_namespace(instance.id))
+
+
+@receiver(post_delete, sender=Subject)
+def subject_deleted(sender, instance, **kwargs):
+    invalidate_reference('subjects')
+
+
+@receiver(m2m_changed, sender=Subject.staff.through)
+def subject_staff_changed(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    if not reverse:
+        subject_ids = [instance.id] if action.startswith('post_') else []
+    elif action == 'pre_clear':
+        subject_ids = list(instance.teachingsubjects.values_list('id',
+                                                                 flat=True))
+    elif action in ('post_add', 'post_remove'):
+        subject_ids = pk_set
+    else:
+        subject_ids = []
+    for subject_id in subject_ids:
+        bump_version(subject_namespace(subject_id))
+
+
+@receiver(m2m_changed, sender=Subject.students.through)
+def subject_students_changed(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """Keeps subscriber counts right for changes made through the
+    relation, such as in the admin."""
+    if action == 'post_add':
+        if reverse:
+            adjust('subscriber_count', pk_set, 1)
+        else:
+            adjust('subscriber_count', [instance.id], len(pk_set))
+    elif action == 'pre_clear' and reverse:
+        adjust('subscriber_count', list(
+            instance.subscribedsubjects.values_list('id', flat=True)), -1)
+    elif action == 'post_remove' and reverse:
+        # Removed ids aren't checked against the table, count again.
+        recount('subscriber_count', list(pk_set))
+    elif action in ('post_remove', 'post_clear') and not reverse:
+        recount('subscriber_count', [instance.id])
+
+
+@receiver(m2m_changed, sender=Question.exam.through)
+def question_exams_changed(sender, instance, action, reverse, pk_set,
+                           **kwargs):
+    """Keeps question usage right for changes made through the relation,
+    such as in the admin."""
+    if not reverse:
+        if action.startswith('post_'):
+            recount_usage([instance.id])
+    elif action == 'pre_clear':
+        instance._cleared_question_ids = list(
+            instance.question_set.values_list('id', flat=True))
+    elif action == 'post_clear':
+        recount_usage(instance._cleared_question_ids)
+    elif action in ('post_add', 'post_remove'):
+        recount_usage(pk_set)
+
+
+@receiver(pre_delete, sender=Exam)
+def exam_deleting(sender, instance, **kwargs):
+    instance._question_ids = list(
+        instance.question_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Exam)
+def exam_deleted(sender, instance, **kwargs):
+    recount_usage(getattr(instance, '_question_ids', []))
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields, **kwargs):
+    """Subject pages show the names of their staff and uploaders."""
+    if created or update_fields == frozenset(['last_login']):
+        return
+    bump_version(STAFF_NAMESPACE)
+    subject_ids = Subject.objects.filter(
+        Q(staff=instance) | Q(resource__uploader=instance)).values_list(
+            'id', flat=True).distinct()
+    for subject_id in subject_ids:
+        bump_version(subject_namespace(subject_id))
+
+
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def profile_changed(sender, instance, created=False, **kwargs):
+    """The staff directory lists teachers and HODs by department."""
+    if created and instance.status not in STAFF_STATUSES:
+        return
+    bump_version(STAFF_NAMESPACE)
+
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def department_changed(sender, instance, created=False, **kwargs):
+    invalidate_reference('departments')
+    if not created:
+        bump_version(STAFF_NAMESPACE)
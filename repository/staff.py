@@ -0,0 +1,49 @@
+from collections import OrderedDict, namedtuple
+
+from django.core.cache import cache
+
+from repository.caching import get_version
+from repository.models import Profile
+from repository.permissions import STAFF_STATUSES
+
+STAFF_NAMESPACE = 'staff'
+DIRECTORY_CACHE_KEY = 'staffdirectory:%s'
+
+
+class StaffMember(namedtuple('StaffMember', 'id first_name last_name')):
+
+    @property
+    def full_name(self):
+        return self.first_name + " " + self.last_name
+
+
+def build_staff_directory():
+    """Return an OrderedDict of department name to the teachers and HODs of
+    the department, loaded with a single query."""
+    directory = OrderedDict()
+    rows = Profile.objects.filter(status__in=STAFF_STATUSES).values_list(
+        'department__name', 'user_id', 'user__first_name',
+        'user__last_name').order_by('department__name', 'user__first_name',
+                                    'user__last_name')
+    for department, user_id, first_name, last_name in rows:
+        directory.setdefault(department, []).append(
+            StaffMember(user_id, first_name, last_name))
+    return directory
+
+
+def get_staff_directory():
+    """Return the staff directory, cached until a profile, user or department
+    changes."""
+    key = DIRECTORY_CACHE_KEY % get_version(STAFF_NAMESPACE)
+    directory = cache.get(key)
+    if directory is None:
+        directory = build_staff_directory()
+        cache.set(key, directory)
+    return directory
+
+
+def get_staff_choices():
+    """Return (user id, name) choices for every teacher and HOD."""
+    return [(member.id, member.full_name)
+            for members in get_staff_directory().values()
+            for member in members]
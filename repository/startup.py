@@ -0,0 +1,50 @@
+"""Time the start of a fresh process, phase by phase.
+
+Run as ``python -m repository.startup`` from the project directory. It
+prints a JSON list of (phase, milliseconds, queries) rows. The
+profile_startup management command runs it several times and reports the
+medians."""
+import json
+import os
+import sys
+import time
+
+
+def profile():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'vijnana.settings')
+    phases = []
+    start = time.time()
+
+    def mark(phase):
+        now = time.time()
+        phases.append((phase, round((now - mark.last) * 1000, 2),
+                       len(connection.queries_log)))
+        connection.queries_log.clear()
+        mark.last = now
+    mark.last = start
+
+    from django.conf import settings
+    settings.INSTALLED_APPS
+    from django.db import connection
+    # Record every query run while starting up, whatever DEBUG is.
+    connection.force_debug_cursor = True
+    mark('settings')
+
+    import django
+    django.setup()
+    mark('app ready')
+
+    import vijnana.wsgi  # noqa
+    mark('wsgi application')
+
+    from django.core.urlresolvers import get_resolver
+    get_resolver(None).url_patterns
+    mark('urlconf')
+
+    phases.append(('total', round((time.time() - start) * 1000, 2),
+                   sum(x[2] for x in phases)))
+    return phases
+
+
+if __name__ == '__main__':
+    json.dump(profile(), sys.stdout)
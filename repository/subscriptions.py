@@ -0,0 +1,69 @@
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+
+from repository.counters import adjust
+from repository.models import Subject
+
+Students = Subject.students.through
+
+
+def subscribed_subject_ids(user):
+    return set(Students.objects.filter(user_id=user.pk).values_list(
+        'subject_id', flat=True))
+
+
+def update_subscriptions(user, subscribe=(), unsubscribe=()):
+    """Subscribe `user` to the subjects in `subscribe` and unsubscribe from
+    those in `unsubscribe`, with set-based writes to the through table.
+    Unknown subjects and subscriptions already in the requested state are
+    skipped. Returns the ids of the subjects the user is subscribed to."""
+    subscribe, unsubscribe = set(subscribe), set(unsubscribe)
+    if subscribe & unsubscribe:
+        raise ValueError('Subjects both subscribed and unsubscribed: %s' %
+                         ', '.join(str(x) for x in sorted(subscribe &
+                                                          unsubscribe)))
+    # A concurrent request may add the same rows, run again if it does.
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                current = subscribed_subject_ids(user)
+                added = subscribe - current
+                if added:
+                    added = set(Subject.objects.filter(
+                        id__in=added).values_list('id', flat=True))
+                    Students.objects.bulk_create(
+                        [Students(subject_id=x, user_id=user.pk)
+                         for x in added])
+                removed = unsubscribe & current
+                if removed:
+                    Students.objects.filter(user_id=user.pk,
+                                            subject_id__in=removed).delete()
+                adjust('subscriber_count', added, 1)
+                adjust('subscriber_count', removed, -1)
+                return (current | added) - removed
+        except IntegrityError:
+            if attempt:
+                raise
+
+
+def enroll_students(subjects, user_ids):
+    """Subscribe a cohort of students, given by user id, to each of the
+    subjects. Returns the number of subscriptions added."""
+    subjects = list(subjects)
+    user_ids = set(user_ids)
+    existing = set(Students.objects.filter(
+        subject_id__in=[x.id for x in subjects]).values_list(
+            'subject_id', 'user_id'))
+    rows = [Students(subject_id=subject.id, user_id=user_id)
+            for subject in subjects
+            for user_id in user_ids
+            if (subject.id, user_id) not in existing]
+    added = defaultdict(list)
+    for subject_id, count in Counter(x.subject_id for x in rows).items():
+        added[count].append(subject_id)
+    with transaction.atomic():
+        Students.objects.bulk_create(rows, batch_size=500)
+        for count, subject_ids in added.items():
+            adjust('subscriber_count', subject_ids, count)
+    return len(rows)
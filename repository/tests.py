@@ -1,7 +1,47 @@
-from django.db import IntegrityError
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from array import array
+from io import BytesIO
+from unittest import skipUnless
 
-from .models import Subject, Profile
+from django.core.cache import cache
+from django.db import IntegrityError, connection
+from django.template.base import Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from docx import Document
+from openpyxl import Workbook
+
+from .benchmark import compare, routes, run, seed
+from .blueprint import Blueprint, select_questions
+from .counters import reconcile
+from .middleware import duplicated_queries
+from .usage import recently_used
+from .views.ResourceActivities import GetResourcesOfType
+from .views.SubjectActivities import ViewQuestions
+from .views.shared import is_user_hod, is_user_hod_or_teacher
+from .forms import AssignOrRemoveStaffForm
+from .extraction import (EXTRACTED, EXTRACTORS, SKIPPED, UNCHANGED,
+                         ExtractorUnavailable, pending_resource_ids,
+                         process_backlog)
+
+from .jobs import enqueue_questionpaper, run_pending_jobs
+from .models import (Department, Exam, Question, QuestionPaperJob,
+                     QuestionUsage, Resource, Subject, Profile,
+                     question_hash)
+from .questionbank import DUPLICATE, IMPORTED, INVALID, import_question_bank
+from .questionpaper import (INSTITUTE, attach_questions, create_qp_dataset,
+                            draw_sets, get_template, render_paper)
+from .questionpool import POOL_CACHE_KEY, get_pool, invalidate_pool
+from .referencedata import get_departments, get_subjects
+from .pagination import encode_cursor, paginate
+from .permissions import STAFF_STATUSES
+from .search import SearchResults
+from .staff import get_staff_directory
+from .subscriptions import (enroll_students, subscribed_subject_ids,
+                            update_subscriptions)
 from django.contrib.auth.models import User
 
 
@@ -94,3 +134,998 @@ class LinkTests(TestCase):
     def test_homepage(self):
         response = self.client.get('/')
         self.assertEqual(response.status_code, 200)
+
+
+class QuestionPoolTests(TestCase):
+
+    def setUp(self):
+        self.subject = Subject.objects.create(code='testsubject3',
+                                              department_id=1)
+        for i in range(5):
+            Question.objects.create(text='Question %d' % i, module=1,
+                                    part='A', co='1', level='Knowledge',
+                                    subject=self.subject)
+
+    def test_pool_draws_from_bucket(self):
+        pool = get_pool(self.subject.id)
+        self.assertEqual(pool.count(1, 'A', 'Knowledge'), 5)
+        self.assertEqual(len(set(pool.draw('1', 'A', 'Knowledge', 3))), 3)
+        self.assertEqual(len(pool.draw(1, 'A', 'Knowledge', 10)), 5)
+        self.assertEqual(pool.draw(2, 'A', 'Knowledge', 3), [])
+
+    def test_pool_invalidated_on_question_change(self):
+        get_pool(self.subject.id)
+        Question.objects.create(text='Question 5', module=1, part='A',
+                                co='1', level='Knowledge',
+                                subject=self.subject)
+        self.assertEqual(get_pool(self.subject.id).count(1, 'A',
+                                                         'Knowledge'), 6)
+
+
+class BlueprintTests(TestCase):
+
+    def setUp(self):
+        self.subject = Subject.objects.create(code='testsubject8',
+                                              department_id=1)
+        levels = ['Knowledge', 'Application']
+        Question.objects.bulk_create(
+            Question(text='Question %d' % i, text_hash=str(i),
+                     module=1 + i % 2, part='AB'[i % 3 == 0],
+                     co=str(1 + i % 4), level=levels[i % 5 == 0],
+                     subject=self.subject)
+            for i in range(60))
+        # bulk_create() skips the signal that drops the cached pool.
+        invalidate_pool(self.subject.id)
+        self.blueprint = Blueprint.from_dict({
+            'parts': {'A': {'count': 6, 'marks': 2},
+                      'B': {'count': 3, 'marks': 6}},
+            'total_marks': 30, 'outcomes': ['1', '2', '3', '4'],
+            'levels': {'Knowledge': 7, 'Application': 2}})
+
+    def test_selection_meets_blueprint(self):
+        for _ in range(10):
+            selected = select_questions(self.subject, self.blueprint)
+            questions = Question.objects.in_bulk(
+                selected['Part A'] + selected['Part B'])
+            self.assertEqual(len(questions), 9)
+            self.assertEqual(
+                [len(selected[x]) for x in ('Part A', 'Part B', 'Part C')],
+                [6, 3, 0])
+            self.assertTrue(all(questions[x].part == 'A'
+                                for x in selected['Part A']))
+            self.assertEqual(set(x.co for x in questions.values()),
+                             set(['1', '2', '3', '4']))
+            self.assertEqual(sum(x.level == 'Application'
+                                 for x in questions.values()), 2)
+
+    def test_infeasible_blueprints_fail_fast(self):
+        parts = {'A': {'count': 6, 'marks': 2}}
+        with self.assertRaisesRegexp(ValueError, 'add up to 12 marks'):
+            Blueprint.from_dict({'parts': parts, 'total_marks': 20})
+        with self.assertRaisesRegexp(ValueError, 'outcome 9'):
+            select_questions(self.subject, Blueprint.from_dict(
+                {'parts': parts, 'outcomes': ['9']}))
+        with self.assertRaisesRegexp(ValueError, 'level mix'):
+            select_questions(self.subject, Blueprint.from_dict(
+                {'parts': {'A': {'count': 6, 'marks': 1},
+                           'B': {'count': 6, 'marks': 1}},
+                 'levels': {'Application': 11, 'Knowledge': 1}}))
+        with self.assertRaisesRegexp(ValueError, 'Part A needs 50'):
+            select_questions(self.subject, Blueprint.from_dict(
+                {'parts': {'A': {'count': 50, 'marks': 1}}}))
+
+    def test_recent_exam_questions_left_out(self):
+        exam = Exam.objects.create(name='Series 1', totalmarks='12',
+                                   time='3', subject=self.subject,
+                                   questionpaper='questionpapers/1.docx')
+        part_a = list(self.subject.question_set.filter(
+            part='A').values_list('id', flat=True))
+        exam.question_set.add(*part_a[6:])
+        blueprint = Blueprint.from_dict(
+            {'parts': {'A': {'count': 6, 'marks': 2}}, 'recent_exams': 1})
+        self.assertEqual(sorted(select_questions(self.subject, blueprint)[
+            'Part A']), sorted(part_a[:6]))
+
+    def test_blueprint_generates_disjoint_sets(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        user = User.objects.create(username='testteacher')
+        user.set_password('testteacher')
+        user.save()
+        Profile.objects.create(user=user, department_id=1, status='teacher')
+        self.client.login(username='testteacher', password='testteacher')
+        blueprint = json.dumps(self.blueprint.to_dict())
+        data = {'examname': 'Series 1', 'totalmarks': '30', 'time': '3',
+                'sets': '2', 'form-TOTAL_FORMS': '0',
+                'form-INITIAL_FORMS': '0'}
+        response = self.client.post(
+            '/subject/%d/generate_questionpaper/' % self.subject.id,
+            dict(data, totalmarks='40', blueprint=blueprint.replace(
+                '"total_marks": 30', '"total_marks": 40')))
+        self.assertContains(response, 'add up to 30 marks, not 40')
+        # One set of 25 Part A questions can be drawn, but not two.
+        response = self.client.post(
+            '/subject/%d/generate_questionpaper/' % self.subject.id,
+            dict(data, totalmarks='25', blueprint=json.dumps(
+                {'parts': {'A': {'count': 25, 'marks': 1}}})))
+        self.assertContains(response, 'Part A needs 25 questions, 15')
+        self.assertFalse(Exam.objects.exists())
+        with override_settings(MEDIA_ROOT=media_root):
+            self.client.post(
+                '/subject/%d/generate_questionpaper/' % self.subject.id,
+                dict(data, blueprint=blueprint))
+            self.assertEqual(run_pending_jobs(), 1)
+        first, second = Exam.objects.order_by('id')
+        first_ids = set(first.question_set.values_list('id', flat=True))
+        second_ids = set(second.question_set.values_list('id', flat=True))
+        self.assertEqual((len(first_ids), len(second_ids)), (9, 9))
+        self.assertFalse(first_ids & second_ids)
+
+
+class QuestionBankImportTests(TestCase):
+
+    def make_workbook(self, rows):
+        workbook = Workbook()
+        sheet = workbook.active
+        for row in rows:
+            sheet.append(row)
+        qbfile = BytesIO()
+        workbook.save(qbfile)
+        qbfile.seek(0)
+        return qbfile
+
+    def test_import_report(self):
+        subject = Subject.objects.create(code='testsubject4',
+                                         department_id=1)
+        Question.objects.create(text='Existing question', module=1,
+                                part='A', co='1', level='Knowledge',
+                                subject=subject)
+        qbfile = self.make_workbook([
+            ['No', 'Question', 'Module', 'CO', 'Part', 'Level'],
+            [1, 'New question', 2, 3, 'B', 'Analysis'],
+            [None, ' ', None, None, None, None],
+            [2, 'New question', 2, 3, 'B', 'Analysis'],
+            [3, 'Existing question', 1, 1, 'A', 'Knowledge'],
+            [None, None, None, None, None, ''],
+        ])
+        report = import_question_bank(qbfile, subject)
+        self.assertEqual([(x.row, x.status) for x in report],
+                         [(2, IMPORTED), (4, DUPLICATE), (5, DUPLICATE)])
+        question = Question.objects.get(text='New question')
+        self.assertEqual((question.module, question.co, question.part),
+                         (2, '3', 'B'))
+
+    def test_upload_without_problems_redirects(self):
+        subject = Subject.objects.create(code='testsubject4',
+                                         department_id=1)
+        qbfile = self.make_workbook([
+            ['No', 'Question', 'Module', 'CO', 'Part', 'Level'],
+            [1, 'New question', 2, 3, 'B', 'Analysis'],
+        ])
+        qbfile.name = 'questionbank.xlsx'
+        url = '/subject/%d/upload_questionbank/' % subject.id
+        response = self.client.post(url, {'qbfile': qbfile})
+        self.assertRedirects(response, '/subject/%d' % subject.id,
+                             fetch_redirect_response=False)
+        notxlsx = BytesIO(b'not a workbook')
+        notxlsx.name = 'questionbank.xlsx'
+        response = self.client.post(url, {'qbfile': notxlsx})
+        self.assertContains(response, 'Some problem with the file')
+        report = import_question_bank(self.make_workbook(
+            [[1, 'Headless question', 1, 1, 'A', 'Knowledge'],
+             ['x', 'Bad row', 'y', 1, 'A', 'Knowledge']]), subject)
+        self.assertEqual([(x.row, x.status) for x in report],
+                         [(1, IMPORTED), (2, INVALID)])
+
+    def test_duplicates_ignore_case_and_spacing_within_subject(self):
+        subject = Subject.objects.create(code='testsubject5',
+                                         department_id=1)
+        other_subject = Subject.objects.create(code='testsubject6',
+                                               department_id=1)
+        Question.objects.create(text='Define  an Operating System.',
+                                module=1, part='A', co='1',
+                                level='Knowledge', subject=subject)
+        rows = [['No', 'Question', 'Module', 'CO', 'Part', 'Level'],
+                [1, 'define an operating   system.', 1, 1, 'A',
+                 'Knowledge']]
+        report = import_question_bank(self.make_workbook(rows), subject)
+        self.assertEqual([x.status for x in report], [DUPLICATE])
+        report = import_question_bank(self.make_workbook(rows),
+                                      other_subject)
+        self.assertEqual([x.status for x in report], [IMPORTED])
+        with self.assertRaises(IntegrityError):
+            Question.objects.create(text='DEFINE AN OPERATING SYSTEM.',
+                                    module=1, part='A', co='1',
+                                    level='Knowledge', subject=subject)
+
+    def test_admin_form_hashes_and_checks_text(self):
+        subject = Subject.objects.create(code='testsubject5',
+                                         department_id=1)
+        Question.objects.create(text='Define an operating system.',
+                                module=1, part='A', co='1',
+                                level='Knowledge', subject=subject)
+        User.objects.create_superuser('testadmin', 'admin@example.com',
+                                      'testadmin')
+        self.client.login(username='testadmin', password='testadmin')
+        exam = Exam.objects.create(name='Series 1', totalmarks='50',
+                                   time='3', subject=subject)
+        data = {'text': 'DEFINE an operating system.', 'module': 1,
+                'part': 'A', 'co': '1', 'level': 'Knowledge',
+                'subject': subject.id, 'exam': [exam.id]}
+        response = self.client.post('/admin/repository/question/add/',
+                                    data)
+        self.assertContains(response, 'The subject already has this question')
+        response = self.client.post('/admin/repository/question/add/',
+                                    dict(data, text='Define a process.'))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Question.objects.get(text='Define a process.')
+                         .text_hash, question_hash('Define a process.'))
+
+
+class QuestionPaperJobTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        department = Department.objects.create(name='Test Department')
+        self.subject = Subject.objects.create(code='testsubject5',
+                                              name='Test Subject',
+                                              department=department)
+        for i in range(4):
+            Question.objects.create(text='Question %d' % i, module=1,
+                                    part='A', co='1', level='Knowledge',
+                                    subject=self.subject)
+        user = User.objects.create(username='testteacher')
+        user.set_password('testteacher')
+        user.save()
+        Profile.objects.create(user=user, department=department,
+                               status='teacher')
+        self.client.login(username='testteacher', password='testteacher')
+
+    def tearDown(self):
+        shutil.rmtree(self.media_root)
+
+    def test_generation_is_queued_and_run_by_worker(self):
+        with override_settings(MEDIA_ROOT=self.media_root):
+            response = self.client.post(
+                '/subject/%d/generate_questionpaper/' % self.subject.id,
+                {'examname': 'Series 1', 'totalmarks': '50', 'time': '3',
+                 'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '0',
+                 'form-0-module': '1', 'form-0-part': 'A',
+                 'form-0-level': 'Knowledge', 'form-0-count': '2'})
+            exam = Exam.objects.get(name='Series 1')
+            self.assertRedirects(response, '/subject/%d/questionpaper/%d' %
+                                 (self.subject.id, exam.id))
+            self.assertEqual(exam.job.status, QuestionPaperJob.PENDING)
+            self.assertEqual(run_pending_jobs(), 1)
+            status_url = '/subject/%d/questionpaper/%d/status' % (
+                self.subject.id, exam.id)
+            response = self.client.get(status_url)
+        self.assertEqual(response.json()['status'], QuestionPaperJob.DONE)
+        self.assertEqual(exam.question_set.count(), 2)
+        # The job drew from the cached pool instead of rebuilding it.
+        self.assertIsNotNone(cache.get(POOL_CACHE_KEY % self.subject.id))
+
+    def test_job_redraws_questions_missing_from_the_database(self):
+        pool = get_pool(self.subject.id)
+        # Deleted questions that the worker's pool still has.
+        pool.buckets[pool.key(1, 'A', 'Knowledge')] = array(
+            'l', range(999996, 1000000))
+        cache.set(POOL_CACHE_KEY % self.subject.id, pool, None)
+        exam = Exam.objects.create(name='Series 1', totalmarks='50',
+                                   time='3', subject=self.subject)
+        enqueue_questionpaper(exam, [(1, 'A', 'Knowledge', 4)])
+        with override_settings(MEDIA_ROOT=self.media_root):
+            run_pending_jobs()
+        self.assertEqual(QuestionPaperJob.objects.get(exam=exam).status,
+                         QuestionPaperJob.DONE)
+        self.assertEqual(exam.question_set.count(), 4)
+
+    def test_job_failure_with_unicode_message_is_recorded(self):
+        exam = Exam.objects.create(name='Series 1', totalmarks='50',
+                                   time='3', subject=self.subject)
+        enqueue_questionpaper(exam, [(1, 'A', u'Compr\xe9hension', 1)])
+        run_pending_jobs()
+        job = QuestionPaperJob.objects.get(exam=exam)
+        self.assertEqual(job.status, QuestionPaperJob.FAILED)
+        self.assertIn(u'Compr\xe9hension', job.error)
+
+    def test_sets_are_drawn_apart_and_generated_by_one_job(self):
+        with override_settings(MEDIA_ROOT=self.media_root,
+                               QUESTIONPAPER_RENDER_PROCESSES=2):
+            response = self.client.post(
+                '/subject/%d/generate_questionpaper/' % self.subject.id,
+                {'examname': 'Series 1', 'totalmarks': '50', 'time': '3',
+                 'sets': '2',
+                 'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '0',
+                 'form-0-module': '1', 'form-0-part': 'A',
+                 'form-0-level': 'Knowledge', 'form-0-count': '2'})
+            first, second = Exam.objects.filter(
+                name__startswith='Series 1').order_by('id')
+            self.assertRedirects(response, '/subject/%d/questionpaper/%d' %
+                                 (self.subject.id, first.id))
+            self.assertEqual((first.name, second.name),
+                             ('Series 1 - Set A', 'Series 1 - Set B'))
+            self.assertEqual(run_pending_jobs(), 1)
+            response = self.client.get(
+                '/subject/%d/questionpaper/%d/status' % (self.subject.id,
+                                                         second.id))
+        self.assertEqual(response.json()['status'], QuestionPaperJob.DONE)
+        self.assertIn('url', response.json())
+        first_ids = set(first.question_set.values_list('id', flat=True))
+        second_ids = set(second.question_set.values_list('id', flat=True))
+        self.assertEqual((len(first_ids), len(second_ids)), (2, 2))
+        self.assertFalse(first_ids & second_ids)
+
+    def test_unmet_criteria_are_rejected_before_any_writes(self):
+        response = self.client.post(
+            '/subject/%d/generate_questionpaper/' % self.subject.id,
+            {'examname': 'Series 1', 'totalmarks': '50', 'time': '3',
+             'form-TOTAL_FORMS': '2', 'form-INITIAL_FORMS': '0',
+             'form-0-module': '1', 'form-0-part': 'A',
+             'form-0-level': 'Knowledge', 'form-0-count': '3',
+             'form-1-module': '1', 'form-1-part': 'A',
+             'form-1-level': 'Knowledge', 'form-1-count': '2'})
+        self.assertContains(response, '5 questions asked for, 4 available')
+        response = self.client.post(
+            '/subject/%d/generate_questionpaper/' % self.subject.id,
+            {'examname': 'Series 1', 'totalmarks': '50', 'time': '3',
+             'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '0',
+             'form-0-module': '1', 'form-0-part': 'A',
+             'form-0-level': u'Compr\xe9hension', 'form-0-count': '1'})
+        self.assertContains(response, u'Compr\xe9hension: 1 questions')
+        response = self.client.post(
+            '/subject/%d/generate_questionpaper/' % self.subject.id,
+            {'examname': 'Series 1', 'totalmarks': '50', 'time': '3',
+             'sets': '2', 'max_overlap': '1',
+             'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '0',
+             'form-0-module': '1', 'form-0-part': 'A',
+             'form-0-level': 'Knowledge', 'form-0-count': '4'})
+        self.assertContains(response, 'Not enough questions for 2 sets')
+        self.assertFalse(Exam.objects.exists())
+        exam = Exam.objects.create(name='Series 1', totalmarks='50',
+                                   time='3', subject=self.subject)
+        with self.assertRaises(ValueError):
+            create_qp_dataset(self.subject, exam, 50, 3,
+                              [(1, 'A', 'Knowledge', 'two')])
+        self.assertFalse(exam.question_set.exists())
+
+    def test_questions_attached_in_one_insert(self):
+        exam = Exam.objects.create(name='Series 1', totalmarks='50',
+                                   time='3', subject=self.subject)
+        ids = list(self.subject.question_set.values_list('id', flat=True))
+        exam.question_set.add(ids[0])
+        with CaptureQueriesContext(connection) as one:
+            attach_questions([(exam, ids[:1])])
+        with CaptureQueriesContext(connection) as three:
+            attach_questions([(exam, ids[1:])])
+        self.assertEqual(len(one), len(three))
+        self.assertEqual(len([x for x in three.captured_queries if x['sql']
+                              .startswith('INSERT INTO "repository_question_'
+                                          'exam"')]), 1)
+        self.assertEqual(
+            sorted(exam.question_set.values_list('id', flat=True)), ids[1:])
+        self.assertEqual(sorted(QuestionUsage.objects.values_list(
+            'question_id', 'use_count')), [(x, 1) for x in ids[1:]])
+
+    def test_sets_share_only_up_to_max_overlap(self):
+        pool = get_pool(self.subject.id)
+        criteria = [(1, 'A', 'Knowledge', 3)]
+        with self.assertRaises(ValueError):
+            draw_sets(pool, criteria, 2)
+        first, second = draw_sets(pool, criteria, 2, max_overlap=1)
+        self.assertEqual(len(set(first['Part A'])), 3)
+        self.assertEqual(len(set(second['Part A'])), 3)
+        self.assertEqual(len(set(first['Part A']) & set(second['Part A'])), 2)
+
+    def test_paper_rendered_from_template(self):
+        exam = Exam(name='Series <2> & Retest', subject=self.subject)
+        questions = {'Part A': list(self.subject.question_set.all()),
+                     'Part B': [], 'Part C': []}
+        content = render_paper(self.subject, questions, exam, 50, 3)
+        self.assertIs(get_template(), get_template())
+        paragraphs = Document(BytesIO(content)).paragraphs
+        self.assertEqual([(x.text, x.style.name) for x in paragraphs[:5]],
+                         [(INSTITUTE, 'Paper Title'),
+                          ('Series <2> & Retest', 'Paper Heading'),
+                          ('Test Subject', 'Paper Heading'),
+                          ('Marks : 50' + ' ' * 100 + 'Time : 3', 'Normal'),
+                          ('Part A', 'Paper Part')])
+        self.assertEqual(paragraphs[-1].text, '4. Question 3')
+
+
+class DownloadTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        os.mkdir(os.path.join(self.media_root, 'resources'))
+        with open(os.path.join(self.media_root, 'resources',
+                               'notes.txt'), 'wb') as f:
+            f.write(b'0123456789')
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_full_download(self):
+        response = self.client.get('/uploads/resources/notes.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        response = self.client.get('/uploads/resources/notes.txt',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range_download(self):
+        response = self.client.get('/uploads/resources/notes.txt',
+                                   HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        response = self.client.get('/uploads/resources/notes.txt',
+                                   HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get('/uploads/resources/notes.txt',
+                                   HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+
+    def test_missing_file(self):
+        response = self.client.get('/uploads/resources/../../etc/passwd')
+        self.assertEqual(response.status_code, 404)
+
+    def test_offload_to_proxy(self):
+        with override_settings(SENDFILE_BACKEND='xaccel'):
+            response = self.client.get('/uploads/resources/notes.txt')
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected/resources/notes.txt')
+        self.assertEqual(response.content, b'')
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        user = User.objects.create(username='testuploader')
+        self.subject = Subject.objects.create(code='CS101',
+                                              name='Data Structures',
+                                              department_id=1)
+        for i, title in enumerate(['Linked lists', 'Binary trees',
+                                   'Sorting algorithms']):
+            Resource.objects.create(title=title, category='subject_note',
+                                    subject=self.subject,
+                                    resourcefile='resources/%d.pdf' % i,
+                                    uploader=user)
+
+    def test_search_matches_title_and_subject(self):
+        results = SearchResults('binary')
+        self.assertEqual([x.title for x in results[0:10]], ['Binary trees'])
+        self.assertEqual(SearchResults('structures').count(), 3)
+        self.assertEqual(SearchResults('note sort').count(), 1)
+
+    def test_search_index_follows_subject_changes(self):
+        self.subject.name = 'Algorithms'
+        self.subject.save()
+        self.assertEqual(SearchResults('structures').count(), 0)
+        self.assertEqual(SearchResults('algorithms').count(), 3)
+
+    def test_search_view_paginates(self):
+        response = self.client.post('/search/', {'query': 'lists'})
+        self.assertRedirects(response, '/search/?query=lists')
+        response = self.client.get('/search/', {'query': 'CS101',
+                                                'page': '1'})
+        self.assertEqual(len(response.context['resource_list']), 3)
+
+
+class ExtractionTests(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        os.mkdir(os.path.join(self.media_root, 'resources'))
+        document = Document()
+        document.add_paragraph('Dijkstra shortest path')
+        document.save(os.path.join(self.media_root, 'resources',
+                                   'graphs.docx'))
+        user = User.objects.create(username='testuploader')
+        subject = Subject.objects.create(code='CS102', name='Algorithms',
+                                         department_id=1)
+        Resource.objects.create(title='Graphs', category='subject_note',
+                                subject=subject,
+                                resourcefile='resources/graphs.docx',
+                                uploader=user)
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_extracted_text_is_searchable(self):
+        self.assertEqual(SearchResults('dijkstra').count(), 0)
+        counts = process_backlog(pending_resource_ids(), processes=1)
+        self.assertEqual(counts, {EXTRACTED: 1})
+        self.assertEqual(SearchResults('dijkstra').count(), 1)
+        self.assertEqual(pending_resource_ids(), [])
+        counts = process_backlog(pending_resource_ids(recheck=True),
+                                 processes=1)
+        self.assertEqual(counts, {UNCHANGED: 1})
+
+    def test_files_without_extractor_are_retried(self):
+        def unavailable(path):
+            raise ExtractorUnavailable('pdfminer.six is not installed')
+        self.addCleanup(EXTRACTORS.__setitem__, '.pdf', EXTRACTORS['.pdf'])
+        EXTRACTORS['.pdf'] = unavailable
+        with open(os.path.join(self.media_root, 'resources', 'graphs.pdf'),
+                  'wb') as f:
+            f.write(b'%PDF-1.4')
+        Resource.objects.update(resourcefile='resources/graphs.pdf')
+        counts = process_backlog(pending_resource_ids(), processes=1)
+        self.assertEqual(counts, {SKIPPED: 1})
+        self.assertEqual(len(pending_resource_ids()), 1)
+
+
+class ViewSubjectsTests(TestCase):
+
+    def test_query_count_does_not_grow_with_subjects(self):
+        user = User.objects.create(username='teststudent')
+        user.set_password('teststudent')
+        user.save()
+        Profile.objects.create(user=user, department_id=1,
+                               status='student')
+        for i in range(3):
+            department = Department.objects.create(name='Department %d' % i)
+            for j in range(5):
+                subject = Subject.objects.create(code='S%d%d' % (i, j),
+                                                 department=department)
+                subject.students.add(user)
+        self.client.login(username='teststudent', password='teststudent')
+        # Session, user, profile, departments, subjects and subscriptions.
+        with self.assertNumQueries(6):
+            response = self.client.get('/subjects')
+        self.assertEqual(len(response.context['subscribed_ids']), 15)
+        self.assertContains(response, 'Unsubscribe Me', count=15)
+
+
+class BenchmarkTests(TestCase):
+
+    def test_benchmark_covers_every_route(self):
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(MEDIA_ROOT=media_root):
+                dataset = seed(0.02, media_root)
+                results = run(dataset['user'], dataset['values'], 1)
+        finally:
+            shutil.rmtree(media_root)
+        self.assertEqual(sorted(results), sorted(x for x, _ in routes()))
+        baseline = dict((regex, dict(result, queries=result['queries'] - 1))
+                        for regex, result in results.items()
+                        if result['queries'])
+        self.assertEqual(len(compare(results, baseline)), len(baseline))
+        self.assertEqual(compare(results, results), [])
+
+
+class RequestProfilingTests(TestCase):
+
+    def test_profiled_request_has_server_timing(self):
+        render = Template.__dict__['render']
+        with override_settings(REQUEST_PROFILING_SAMPLE_RATE=1):
+            response = self.client.get('/subjects')
+        self.assertRegexpMatches(response['Server-Timing'],
+                                 r'sql;dur=[0-9.]+;desc="\d+ queries"')
+        self.assertIn('template;dur=', response['Server-Timing'])
+        # Template rendering is only wrapped during profiled requests.
+        self.assertIs(Template.__dict__['render'], render)
+
+    def test_unsampled_request(self):
+        with override_settings(REQUEST_PROFILING_SAMPLE_RATE=0):
+            response = self.client.get('/subjects')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_duplicated_queries(self):
+        queries = [{'sql': 'SELECT * FROM a WHERE id = %d' % i}
+                   for i in range(3)]
+        queries.append({'sql': "SELECT * FROM b WHERE name = 'x'"})
+        self.assertEqual(duplicated_queries(queries),
+                         [('SELECT * FROM a WHERE id = ?', 3)])
+
+
+class ViewSubjectTests(TestCase):
+
+    def setUp(self):
+        self.uploader = User.objects.create(username='testuploader',
+                                            first_name='Test')
+        self.subject = Subject.objects.create(code='CS103', name='Networks',
+                                              department_id=1)
+        Resource.objects.create(title='OSI model', category='subject_note',
+                                subject=self.subject,
+                                resourcefile='resources/osi.pdf',
+                                uploader=self.uploader)
+
+    def test_cached_fragments_skip_queries(self):
+        url = '/subject/%d/' % self.subject.id
+        response = self.client.get(url)
+        self.assertContains(response, 'OSI model')
+        # Only the subject itself is fetched once the fragments are cached.
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertContains(response, 'OSI model')
+
+    def test_fragments_invalidated_on_changes(self):
+        url = '/subject/%d/' % self.subject.id
+        self.client.get(url)
+        Resource.objects.create(title='TCP/IP', category='presentation',
+                                subject=self.subject,
+                                resourcefile='resources/tcp.pdf',
+                                uploader=self.uploader)
+        self.assertContains(self.client.get(url), 'TCP/IP')
+        self.subject.staff.add(self.uploader)
+        self.assertContains(self.client.get(url), 'Staff:')
+        self.uploader.first_name = 'Renamed'
+        self.uploader.save()
+        self.assertContains(self.client.get(url), 'Renamed')
+
+
+class PermissionContextTests(TestCase):
+
+    def test_checks_load_profile_once(self):
+        department = Department.objects.create(name='Test Department')
+        other_department = Department.objects.create(name='Other')
+        user = User.objects.create(username='testhod')
+        Profile.objects.create(user=user, department=department,
+                               status='hod')
+        subject = Subject.objects.create(code='CS104',
+                                         department=department)
+        other_subject = Subject.objects.create(code='ME101',
+                                               department=other_department)
+        request = RequestFactory().get('/')
+        request.user = user
+        with self.assertNumQueries(1):
+            self.assertTrue(is_user_hod(request, subject))
+            self.assertFalse(is_user_hod(request, other_subject))
+            self.assertTrue(is_user_hod_or_teacher(request))
+            self.assertTrue(is_user_hod_or_teacher(request, subject))
+            self.assertFalse(is_user_hod_or_teacher(request, other_subject))
+
+
+class StaffDirectoryTests(TestCase):
+
+    def setUp(self):
+        self.department = Department.objects.create(name='Test Department')
+        self.teacher = User.objects.create(username='testteacher',
+                                           first_name='Test',
+                                           last_name='Teacher')
+        self.profile = Profile.objects.create(user=self.teacher,
+                                              department=self.department,
+                                              status='teacher')
+        student = User.objects.create(username='teststudent')
+        Profile.objects.create(user=student, department=self.department,
+                               status='student')
+
+    def test_directory_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            directory = get_staff_directory()
+        self.assertEqual([x.id for x in directory['Test Department']],
+                         [self.teacher.id])
+        with self.assertNumQueries(0):
+            get_staff_directory()
+
+    def test_directory_follows_status_changes(self):
+        get_staff_directory()
+        self.profile.status = 'student'
+        self.profile.save()
+        self.assertNotIn('Test Department', get_staff_directory())
+        self.profile.status = 'hod'
+        self.profile.save()
+        self.teacher.first_name = 'Renamed'
+        self.teacher.save()
+        self.assertEqual(
+            get_staff_directory()['Test Department'][0].full_name,
+            'Renamed Teacher')
+
+    def test_staff_form_choices_are_current(self):
+        form = AssignOrRemoveStaffForm({'staffselect': [self.teacher.id]})
+        self.assertTrue(form.is_valid())
+        teacher = User.objects.create(username='newteacher')
+        Profile.objects.create(user=teacher, department=self.department,
+                               status='teacher')
+        form = AssignOrRemoveStaffForm({'staffselect': [teacher.id]})
+        self.assertTrue(form.is_valid())
+        self.assertFalse(AssignOrRemoveStaffForm(
+            {'staffselect': ['0']}).is_valid())
+
+
+class ReferenceDataTests(TestCase):
+
+    def test_lists_reload_only_after_changes(self):
+        Department.objects.create(name='Test Department')
+        departments = get_departments()
+        with self.assertNumQueries(0):
+            self.assertIs(get_departments(), departments)
+        department = Department.objects.create(name='Another Department')
+        self.assertIn(department, get_departments())
+        subject = Subject.objects.create(code='CS105', name='Compilers',
+                                         department=department)
+        self.assertIn(subject, get_subjects())
+        subject.delete()
+        self.assertNotIn(subject, get_subjects())
+
+
+class SubscriptionTests(TestCase):
+
+    def setUp(self):
+        self.department = Department.objects.create(name='Test Department')
+        self.student = User.objects.create(username='teststudent')
+        self.student.set_password('teststudent')
+        self.student.save()
+        Profile.objects.create(user=self.student, department=self.department,
+                               status='student')
+        self.subjects = [Subject.objects.create(code='CS2%02d' % i,
+                                                department=self.department)
+                         for i in range(5)]
+        self.ids = [x.id for x in self.subjects]
+
+    def test_bulk_update_is_idempotent(self):
+        self.client.login(username='teststudent', password='teststudent')
+        data = {'subscribe': self.ids[:3] + [0]}
+        response = self.client.post('/subjects/subscriptions', data)
+        self.assertEqual(response.json()['subscribed'], self.ids[:3])
+        response = self.client.post('/subjects/subscriptions', data)
+        self.assertEqual(response.json()['subscribed'], self.ids[:3])
+        response = self.client.post('/subjects/subscriptions',
+                                    {'subscribe': self.ids[3:],
+                                     'unsubscribe': self.ids[:2]})
+        self.assertEqual(response.json()['subscribed'], self.ids[2:])
+        response = self.client.get('/subjects/subscriptions')
+        self.assertEqual(response.json()['subscribed'], self.ids[2:])
+
+    def test_conflicting_update_is_rejected(self):
+        self.client.login(username='teststudent', password='teststudent')
+        response = self.client.post('/subjects/subscriptions',
+                                    {'subscribe': self.ids[:1],
+                                     'unsubscribe': self.ids[:1]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(subscribed_subject_ids(self.student), set())
+
+    def test_enroll_cohort(self):
+        other = User.objects.create(username='otherstudent')
+        Profile.objects.create(user=other, department=self.department,
+                               status='student')
+        cohort = [self.student.id]
+        self.assertEqual(enroll_students(self.subjects[:2], cohort), 2)
+        self.assertEqual(enroll_students(self.subjects[:3], cohort), 1)
+        self.assertEqual(subscribed_subject_ids(self.student),
+                         set(self.ids[:3]))
+        self.assertEqual(subscribed_subject_ids(other), set())
+
+    def test_admin_enrolls_chosen_students(self):
+        User.objects.create_superuser('testadmin', 'admin@example.com',
+                                      'testadmin')
+        other = User.objects.create(username='otherstudent')
+        Profile.objects.create(user=other, department=self.department,
+                               status='student')
+        self.client.login(username='testadmin', password='testadmin')
+        data = {'action': 'enroll_cohort',
+                '_selected_action': self.ids[:2]}
+        response = self.client.post('/admin/repository/subject/', data)
+        self.assertContains(response, 'otherstudent')
+        response = self.client.post('/admin/repository/subject/', dict(
+            data, apply='Subscribe', students=[other.id]))
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(subscribed_subject_ids(other), set(self.ids[:2]))
+        self.assertEqual(subscribed_subject_ids(self.student), set())
+
+
+class SubjectCounterTests(TestCase):
+
+    def setUp(self):
+        self.department = Department.objects.create(name='Test Department')
+        self.user = User.objects.create(username='teststudent')
+        self.subject = Subject.objects.create(code='CS301',
+                                              department=self.department)
+
+    def counts(self):
+        return Subject.objects.values_list(
+            'subscriber_count', 'resource_count', 'question_count',
+            'exam_count').get(id=self.subject.id)
+
+    def test_counters_follow_changes(self):
+        update_subscriptions(self.user, subscribe=[self.subject.id])
+        resource = Resource.objects.create(
+            title='Notes', category='subject_note', subject=self.subject,
+            resourcefile='resources/notes.pdf', uploader=self.user)
+        Question.objects.create(text='What is a compiler?', module=1,
+                                part='A', co='1', level='Knowledge',
+                                subject=self.subject)
+        Exam.objects.create(name='Test', totalmarks='10', time='1',
+                            subject=self.subject)
+        self.assertEqual(self.counts(), (1, 1, 1, 1))
+        resource.delete()
+        self.subject.students.remove(self.user)
+        self.assertEqual(self.counts(), (0, 0, 1, 1))
+        self.user.subscribedsubjects.add(self.subject)
+        self.assertEqual(self.counts(), (1, 0, 1, 1))
+        self.user.subscribedsubjects.clear()
+        self.assertEqual(self.counts(), (0, 0, 1, 1))
+
+    def test_reconcile_repairs_drift(self):
+        self.subject.students.add(self.user)
+        Subject.objects.filter(id=self.subject.id).update(
+            subscriber_count=5, exam_count=3)
+        self.assertEqual(reconcile(), [self.subject.id])
+        self.assertEqual(self.counts(), (1, 0, 0, 0))
+        self.assertEqual(reconcile(), [])
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans are read on SQLite.')
+class IndexUsageTests(TestCase):
+
+    def assertUsesIndex(self, queryset, columns):
+        table = queryset.model._meta.db_table
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            indexes = [name for name, constraint in
+                       connection.introspection.get_constraints(
+                           cursor, table).items()
+                       if constraint['index'] and
+                       constraint['columns'] == columns]
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertEqual(len(indexes), 1)
+        self.assertIn('INDEX %s' % indexes[0], plan)
+
+    def test_hot_filters_use_indexes(self):
+        columns = ['subject_id', 'module', 'part', 'level']
+        self.assertUsesIndex(Question.objects.filter(
+            subject_id=1, module=1, part='A', level='Knowledge'), columns)
+        self.assertUsesIndex(Question.objects.filter(
+            subject_id=1).values_list('id', 'module', 'part', 'level'),
+            columns)
+        self.assertUsesIndex(Resource.objects.filter(
+            category='subject_note'), ['category', 'subject_id'])
+        self.assertUsesIndex(Profile.objects.filter(
+            status__in=STAFF_STATUSES), ['status', 'department_id'])
+        self.assertUsesIndex(QuestionUsage.objects.filter(
+            subject_id=1, last_used__gte='2016-01-01').values_list(
+                'question_id', flat=True), ['subject_id', 'last_used'])
+
+
+class ViewQuestionsTests(TestCase):
+
+    def setUp(self):
+        department = Department.objects.create(name='Test Department')
+        self.subject = Subject.objects.create(code='CS401',
+                                              department=department)
+        for i in range(7):
+            Question.objects.create(text='Question %d' % i, module=i % 2 + 1,
+                                    part='A', co='1', level='Knowledge',
+                                    subject=self.subject)
+        user = User.objects.create(username='testteacher')
+        user.set_password('testteacher')
+        user.save()
+        Profile.objects.create(user=user, department=department,
+                               status='teacher')
+        self.client.login(username='testteacher', password='testteacher')
+
+    def test_pages_follow_cursors(self):
+        questions = self.subject.question_set.all()
+        ids = [x.id for x in questions.order_by('id')]
+        page = paginate(questions, ['id'], 3)
+        self.assertEqual([x.id for x in page], ids[:3])
+        self.assertFalse(page.has_previous)
+        page = paginate(questions, ['id'], 3, after=page.next_cursor)
+        self.assertEqual([x.id for x in page], ids[3:6])
+        last = paginate(questions, ['id'], 3, after=page.next_cursor)
+        self.assertEqual([x.id for x in last], ids[6:])
+        self.assertIsNone(last.next_cursor)
+        page = paginate(questions, ['id'], 3, before=last.previous_cursor)
+        self.assertEqual([x.id for x in page], ids[3:6])
+        page = paginate(questions, ['-module', 'id'], 4)
+        page = paginate(questions, ['-module', 'id'], 4,
+                        after=page.next_cursor)
+        self.assertEqual([x.id for x in page], (ids[1::2] + ids[0::2])[4:])
+        with self.assertRaises(ValueError):
+            paginate(questions, ['id'], 3, after='not a cursor')
+        for values in ([{}], [None, 1], ['x', 1], [1], [2, [3]]):
+            with self.assertRaises(ValueError):
+                paginate(questions, ['-module', 'id'], 3,
+                         before=encode_cursor(values))
+
+    def test_json_listing_filters_questions(self):
+        url = '/subject/%d/questions' % self.subject.id
+        response = self.client.get(url, {'format': 'json', 'module': 2})
+        data = response.json()
+        self.assertEqual([x['text'] for x in data['questions']],
+                         ['Question 1', 'Question 3', 'Question 5'])
+        self.assertIsNone(data['next'])
+        response = self.client.get(url, {'module': 'x'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(url, {'sort': 'least_used',
+                                         'after': encode_cursor([{}, 1])})
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(self.client.get(url), 'Question 6')
+
+    def use_questions(self):
+        ids = list(self.subject.question_set.order_by('id').values_list(
+            'id', flat=True))
+        exams = [Exam.objects.create(name='Series %d' % i, totalmarks='50',
+                                     time='3', subject=self.subject,
+                                     questionpaper='questionpapers/%d.docx' %
+                                     i) for i in range(2)]
+        exams[0].question_set.add(*ids[:3])
+        exams[1].question_set.add(ids[0], ids[3])
+        return ids, exams
+
+    def test_usage_follows_exam_changes(self):
+        ids, exams = self.use_questions()
+        usage = lambda: sorted(QuestionUsage.objects.values_list(
+            'question_id', 'use_count'))
+        self.assertEqual(usage(), [(ids[0], 2), (ids[1], 1), (ids[2], 1),
+                                   (ids[3], 1)])
+        self.assertEqual(recently_used(self.subject.id, 1),
+                         set([ids[0], ids[3]]))
+        exams[0].question_set.remove(ids[1])
+        Question.objects.get(id=ids[2]).exam.clear()
+        exams[1].delete()
+        self.assertEqual(usage(), [(ids[0], 1)])
+
+    def test_questions_sorted_and_filtered_by_freshness(self):
+        ids, _ = self.use_questions()
+        url = '/subject/%d/questions' % self.subject.id
+        listed = lambda **params: [x['id'] for x in self.client.get(
+            url, dict(params, format='json')).json()['questions']]
+        self.assertEqual(listed(unused_in=1), [ids[1], ids[2]] + ids[4:])
+        self.assertEqual(listed(unused_in=2), ids[4:])
+        self.assertEqual(listed(unused_in=5), ids[4:])
+        ViewQuestions.per_page = 4
+        self.addCleanup(setattr, ViewQuestions, 'per_page', 50)
+        data = self.client.get(url, {'format': 'json',
+                                     'sort': 'least_used'}).json()
+        self.assertEqual([x['id'] for x in data['questions']],
+                         ids[4:] + [ids[1]])
+        self.assertEqual(listed(sort='least_used', after=data['next']),
+                         [ids[2], ids[3], ids[0]])
+        self.assertEqual(data['questions'][0]['times_used'], 0)
+        self.assertEqual(self.client.get(url, {'unused_in': 0}).status_code,
+                         400)
+
+
+class ResourcesOfTypeTests(TestCase):
+
+    def setUp(self):
+        self.uploader = User.objects.create(username='testuploader')
+        self.subjects = [Subject.objects.create(code=code, department_id=1)
+                         for code in ('EC101', 'CS101')]
+        for i in range(5):
+            Resource.objects.create(
+                title='Paper %d' % i, category='university_question_paper',
+                subject=self.subjects[i % 2],
+                resourcefile='resources/paper%d.pdf' % i,
+                uploader=self.uploader)
+
+    def test_listing_is_paged_and_sorted(self):
+        url = '/type/Previous_Question_Paper/'
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.context['count'], 5)
+        self.assertEqual([x.title for x in response.context['page']],
+                         ['Paper 4', 'Paper 3', 'Paper 2', 'Paper 1',
+                          'Paper 0'])
+        GetResourcesOfType.per_page = 2
+        try:
+            response = self.client.get(url, {'sort': 'subject'})
+            page = response.context['page']
+            self.assertEqual([x.title for x in page], ['Paper 1', 'Paper 3'])
+            response = self.client.get(
+                url, {'sort': 'subject', 'after': page.next_cursor})
+            self.assertEqual([x.title for x in response.context['page']],
+                             ['Paper 0', 'Paper 2'])
+        finally:
+            GetResourcesOfType.per_page = 20
+
+    def test_count_follows_changes(self):
+        url = '/type/University_Question_Paper/'
+        self.assertEqual(self.client.get(url).context['count'], 5)
+        Resource.objects.filter(title='Paper 0').get().delete()
+        self.assertEqual(self.client.get(url).context['count'], 4)
+        self.assertEqual(self.client.get('/type/Presentation/').status_code,
+                         404)
@@ -0,0 +1,56 @@
+"""Usage history of questions.
+
+QuestionUsage keeps, for every question that has been in an exam, the
+number of exams it has been in and when the latest was created, so asking
+which questions a subject used recently is one indexed query instead of a
+walk over the questions of each exam. Rows are recounted from the
+Question.exam relation whenever it changes."""
+from django.db import transaction
+from django.db.models import Count, Max
+
+from repository.models import Exam, Question, QuestionUsage
+
+
+def recount_usage(question_ids=None):
+    """Recount the usage of the given questions, or of every question."""
+    Used = Question.exam.through
+    rows = Used.objects.all()
+    usage = QuestionUsage.objects.all()
+    if question_ids is not None:
+        question_ids = list(set(question_ids))
+        if not question_ids:
+            return
+        rows = rows.filter(question_id__in=question_ids)
+        usage = usage.filter(question_id__in=question_ids)
+    rows = rows.values('question_id', 'question__subject_id').annotate(
+        use_count=Count('exam_id'),
+        last_used=Max('exam__created_at')).order_by()
+    with transaction.atomic():
+        usage.delete()
+        QuestionUsage.objects.bulk_create(
+            QuestionUsage(question_id=row['question_id'],
+                          subject_id=row['question__subject_id'],
+                          use_count=row['use_count'],
+                          last_used=row['last_used'])
+            for row in rows)
+
+
+def recent_cutoff(subject_id, exams):
+    """Creation time of the oldest of the latest `exams` generated question
+    papers of a subject, or None when it has fewer."""
+    cutoff = Exam.objects.filter(subject_id=subject_id).exclude(
+        questionpaper='').order_by('-created_at', '-id').values_list(
+            'created_at', flat=True)[exams - 1:exams]
+    return cutoff[0] if cutoff else None
+
+
+def recently_used(subject_id, exams):
+    """The ids of the questions in the latest `exams` generated question
+    papers of a subject."""
+    if not exams:
+        return set()
+    usage = QuestionUsage.objects.filter(subject_id=subject_id)
+    cutoff = recent_cutoff(subject_id, exams)
+    if cutoff is not None:
+        usage = usage.filter(last_used__gte=cutoff)
+    return set(usage.values_list('question_id', flat=True))
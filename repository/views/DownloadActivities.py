@@ -0,0 +1,134 @@
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe, urlquote
+from django.views.generic import View
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+
+def read_range(fileobj, start, length):
+    """Yield `length` bytes of a file, starting at `start`, in chunks."""
+    try:
+        fileobj.seek(start)
+        while length > 0:
+            chunk = fileobj.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def parse_range(header, size):
+    """Return the (start, end) byte positions requested by a Range header,
+    None to serve the whole file, or False if the range can't be satisfied.
+    Only single ranges are supported; other forms are served in full."""
+    match = RANGE_RE.match(header.strip())
+    if not match or size == 0:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        start = max(size - int(end), 0)
+        end = size - 1
+    else:
+        start = int(start)
+        end = min(int(end), size - 1) if end else size - 1
+    if start > end or start >= size:
+        return False
+    return start, end
+
+
+class ServeUpload(View):
+    """Serves uploaded files with support for conditional and range requests.
+    When SENDFILE_BACKEND is set, sending the file is left to the front
+    proxy."""
+
+    directory = ''
+
+    def not_modified(self, request, etag, mtime):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            etags = [x.strip() for x in if_none_match.split(',')]
+            return etag in etags or '*' in etags
+        if_modified_since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        return if_modified_since is not None and \
+            int(mtime) <= if_modified_since
+
+    def offload(self, path, fullpath, content_type):
+        backend = getattr(settings, 'SENDFILE_BACKEND', None)
+        response = HttpResponse(content_type=content_type)
+        if backend == 'xsendfile':
+            response['X-Sendfile'] = fullpath
+        elif backend == 'xaccel':
+            response['X-Accel-Redirect'] = urlquote(
+                settings.SENDFILE_URL_PREFIX + self.directory + '/' + path)
+        else:
+            return None
+        return response
+
+    def get(self, request, path):
+        try:
+            fullpath = safe_join(settings.MEDIA_ROOT, self.directory, path)
+            stat_result = os.stat(fullpath)
+        except (SuspiciousFileOperation, OSError):
+            raise Http404('File not found.')
+        if not stat.S_ISREG(stat_result.st_mode):
+            raise Http404('File not found.')
+        size = stat_result.st_size
+        mtime = stat_result.st_mtime
+        etag = '"%x-%x"' % (int(mtime), size)
+        last_modified = http_date(mtime)
+
+        if self.not_modified(request, etag, mtime):
+            response = HttpResponseNotModified()
+        else:
+            content_type, encoding = mimetypes.guess_type(fullpath)
+            content_type = content_type or 'application/octet-stream'
+            response = self.offload(path, fullpath, content_type)
+            if response is None:
+                response = self.stream(request, fullpath, size, etag,
+                                       last_modified, content_type)
+            if encoding:
+                response['Content-Encoding'] = encoding
+        response['ETag'] = etag
+        response['Last-Modified'] = last_modified
+        return response
+
+    def stream(self, request, fullpath, size, etag, last_modified,
+               content_type):
+        byte_range = None
+        if 'HTTP_RANGE' in request.META:
+            if_range = request.META.get('HTTP_IF_RANGE')
+            if not if_range or if_range in (etag, last_modified):
+                byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = 'bytes */%d' % size
+            return response
+        if byte_range is None:
+            response = FileResponse(open(fullpath, 'rb'),
+                                    content_type=content_type)
+            response['Content-Length'] = size
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(open(fullpath, 'rb'), start, end - start + 1),
+                status=206, content_type=content_type)
+            response['Content-Length'] = end - start + 1
+            response['Content-Range'] = 'bytes %d-%d/%d' % (start, end,
+                                                            size)
+        response['Accept-Ranges'] = 'bytes'
+        return response
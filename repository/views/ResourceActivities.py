@@ -1,25 +1,26 @@
+from collections import OrderedDict
+
 from django.core.exceptions import ObjectDoesNotExist
+from django.core.paginator import EmptyPage, PageNotAnInteger, Paginator
+from django.db import transaction
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
+from django.utils.http import urlencode
 from django.views.generic import View
 
+from repository.counters import category_count
 from repository.forms import NewResourceForm, SearchForm
 from repository.models import Resource, Subject
+from repository.pagination import paginate
+from repository.referencedata import (RESOURCE_CATEGORIES, RESOURCE_TYPES,
+                                      get_subjects)
+from repository.search import SearchResults
 from shared import is_user_hod_or_teacher
 
 
 class NewResource(View):
     """Let's a new resource to be created"""
 
-    RESOURCE_TYPES = {
-        'Presentation': 'presentation',
-        'Paper Publication': 'paper_publication',
-        'Subject Note': 'subject_note',
-        'Project Thesis': 'project_thesis',
-        'Seminar Report': 'seminar_report',
-        'Previous Question Paper': 'university_question_paper'
-    }
-    subject_list = Subject.objects.all()
     error = ""
     template = "newresource.html"
 
@@ -27,8 +28,8 @@ class NewResource(View):
         if request.user.is_authenticated() and is_user_hod_or_teacher(request):
             return render(request, self.template,
                           {
-                              'subject_list': self.subject_list,
-                              'type_list': self.RESOURCE_TYPES
+                              'subject_list': get_subjects(),
+                              'type_list': RESOURCE_CATEGORIES
                           })
         else:
             return render(request, "error.html",
@@ -52,14 +53,15 @@ class NewResource(View):
                         title=input_title, category=input_category,
                         subject=input_subject, resourcefile=input_file,
                         uploader=resource_uploader)
-                    resource.save()
+                    with transaction.atomic():
+                        resource.save()
                 except Exception as e:
                     self.error = e
                     return render(request, self.template,
                                   {
                                       'error': self.error,
-                                      'subject_list': self.subject_list,
-                                      'type_list': self.RESOURCE_TYPES
+                                      'subject_list': get_subjects(),
+                                      'type_list': RESOURCE_CATEGORIES
                                   })
             return HttpResponseRedirect('/resource/' + str(resource.id))
         else:
@@ -84,67 +86,98 @@ class GetResource(View):
 
 
 class GetResourcesOfType(View):
-    """Displays resources of a specified type"""
+    """Displays resources of a specified type, a page at a time. The sort
+    parameter orders them by newest first or by subject."""
 
-    RESOURCE_TYPES = {
-        'Presentation': 'presentation',
-        'Paper Publication': 'paper_publication',
-        'Subject Note': 'subject_note',
-        'Project Thesis': 'project_thesis',
-        'Seminar Report': 'seminar_report',
-        'Previous Question Paper': 'university_question_paper'
-    }
+    per_page = 20
+    orderings = OrderedDict([
+        ('newest', ['-id']),
+        ('subject', ['subject__code', 'id']),
+    ])
 
     def get(self, request, type_name):
-        try:
-            type_name = type_name.replace('_', ' ')
-            cat = self.RESOURCE_TYPES[type_name]
-            resources = Resource.objects.filter(category=cat)
-            if resources:
-                return render(request, 'type_resource_list.html',
-                              {
-                                  'resource_list': resources,
-                                  'type': type_name
-                              })
-            else:
-                raise ObjectDoesNotExist
-        except ObjectDoesNotExist:
+        type_name = type_name.replace('_', ' ')
+        category = RESOURCE_CATEGORIES.get(type_name)
+        if category is None:
+            # /type/ links made from the category itself, e.g. from the
+            # resource page.
+            category = type_name.lower().replace(' ', '_')
+            type_name = RESOURCE_TYPES.get(category)
+        if type_name is None or not category_count(category):
             return render(request, 'error.html',
                           {
                               'error': 'No resources found.'
                           }, status=404)
+        sort = request.GET.get('sort')
+        if sort not in self.orderings:
+            sort = 'newest'
+        resources = Resource.objects.filter(
+            category=category).select_related('subject', 'uploader')
+        try:
+            page = paginate(resources, self.orderings[sort], self.per_page,
+                            after=request.GET.get('after'),
+                            before=request.GET.get('before'))
+        except ValueError:
+            return render(request, 'error.html',
+                          {
+                              'error': 'Invalid page.'
+                          }, status=400)
+        return render(request, 'type_resource_list.html',
+                      {
+                          'resource_list': page,
+                          'page': page,
+                          'type': type_name,
+                          'count': category_count(category),
+                          'sort': sort,
+                          'sort_options': self.orderings.keys(),
+                          'next_query': urlencode(
+                              {'sort': sort, 'after': page.next_cursor}),
+                          'previous_query': urlencode(
+                              {'sort': sort,
+                               'before': page.previous_cursor}),
+                      })
 
 
 class SearchResource(View):
-    """Search for resources having a specific query in their title"""
+    """Search for resources by title, type, subject or contents"""
     template = 'search.html'
     error = ''
     status = ''
+    per_page = 20
 
     def get(self, request):
-        return render(request, self.template)
-
-    def post(self, request):
+        query = request.GET.get('query', '').strip()
+        if not query:
+            return render(request, self.template)
+        paginator = Paginator(SearchResults(query), self.per_page)
         try:
-            form = SearchForm(request.POST)
-            if form.is_valid():
-                query = form.cleaned_data['query']
-                resource_list = Resource.objects.filter(
-                    title__contains=query)
-                if resource_list:
-                    return render(request, 'search.html',
-                                  {
-                                      'resource_list': resource_list,
-                                      'query': query
-                                  })
-                else:
-                    raise ObjectDoesNotExist
-            else:
-                self.error = 'Something went wrong.'
-                self.status = 500
-        except ObjectDoesNotExist:
+            page = paginator.page(request.GET.get('page', 1))
+        except PageNotAnInteger:
+            page = paginator.page(1)
+        except EmptyPage:
+            page = paginator.page(paginator.num_pages)
+        if not paginator.count:
             self.error = 'Search returned no results.'
             self.status = 404
+            return render(request, 'error.html',
+                          {
+                              'error': self.error
+                          }, status=self.status)
+        return render(request, self.template,
+                      {
+                          'resource_list': page.object_list,
+                          'page': page,
+                          'query': query
+                      })
+
+    def post(self, request):
+        form = SearchForm(request.POST)
+        if form.is_valid():
+            return HttpResponseRedirect(
+                '/search/?' + urlencode({'query':
+                                         form.cleaned_data['query']}))
+        self.error = 'Something went wrong.'
+        self.status = 500
         return render(request, 'error.html',
                       {
                           'error': self.error
@@ -15,6 +15,8 @@ class Home(View):
                 subject_list = user.teachingsubjects.all()
             else:
                 subject_list = user.subscribedsubjects.all()
+            subject_list = subject_list.select_related(
+                'department').order_by('-subscriber_count', 'name')
             return render(request, 'profile.html',
                           {
                               'user': user,
@@ -1,26 +1,40 @@
-import random
-from datetime import datetime
+import json
+from collections import OrderedDict
+from itertools import groupby
 
 from django.contrib import messages
-from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.files import File
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
+from django.db.models import F, Prefetch, Q, Value
+from django.db.models.functions import Coalesce
 from django.forms.formsets import formset_factory
-from django.http import HttpResponseRedirect
+from django.http import HttpResponseRedirect, JsonResponse
 from django.shortcuts import render
+from django.utils.encoding import force_text
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import urlencode
 from django.views.generic import View
-from docx import Document
-from docx.enum.text import WD_ALIGN_PARAGRAPH
-from docx.shared import Pt
-from openpyxl import load_workbook
 
+from repository.blueprint import Blueprint
+from repository.caching import get_version, subject_namespace
 from repository.forms import (AssignOrRemoveStaffForm, NewSubjectForm,
                               QuestionBankUploadForm,
                               QuestionPaperCategoryForm,
                               QuestionPaperGenerateForm)
-from repository.models import Department, Exam, Question, Subject
-from shared import is_user_hod, is_user_hod_or_teacher
+from repository.jobs import enqueue_questionpaper
+from repository.pagination import paginate
+from repository.models import (Department, Exam, Question, QuestionPaperJob,
+                               Subject)
+from repository.questionbank import (IMPORTED, WORKBOOK_ERRORS,
+                                     import_question_bank)
+from repository.questionpaper import draw_sets, select_sets
+from repository.questionpool import get_pool
+from repository.referencedata import RESOURCE_TYPES, get_departments
+from repository.staff import get_staff_directory
+from repository.subscriptions import (subscribed_subject_ids,
+                                      update_subscriptions)
+from repository.usage import recent_cutoff
+from shared import get_permissions, is_user_hod, is_user_hod_or_teacher
 
 
 class NewSubject(View):
@@ -31,12 +45,12 @@ class NewSubject(View):
     status = 200
 
     def get(self, request):
-        department_list = Department.objects.all()
+        department_list = get_departments()
         return render(request, self.template,
                       {'department_list': department_list})
 
     def post(self, request):
-        department_list = Department.objects.all()
+        department_list = get_departments()
         try:
             form = NewSubjectForm(request.POST)
             if form.is_valid():
@@ -67,38 +81,34 @@ class ViewSubject(View):
     error = ''
     status = 200
 
-    def get(self, request, subject_id):
-        RESOURCE_TYPES = {
-            'presentation': 'Presentation',
-            'paper_publication': 'Paper Publication',
-            'subject_note': 'Subject Note',
-            'project_thesis': 'Project Thesis',
-            'seminar_report': 'Seminar Report',
-            'university_question_paper': 'Previous University Question Paper'
-        }
+    def group_resources(self, subject):
+        """Resources of a subject, with uploaders, grouped by category"""
+        resource_list = OrderedDict()
+        resources = subject.resource_set.select_related(
+            'uploader').order_by('category', 'id')
+        for category, group in groupby(resources, lambda x: x.category):
+            resource_list[RESOURCE_TYPES[category]] = list(group)
+        return resource_list
 
+    def get(self, request, subject_id):
         try:
             subject = Subject.objects.get(id=subject_id)
-            resource_list = {}
-            for resource in subject.resource_set.all():
-                restype = RESOURCE_TYPES[resource.category]
-                if restype not in resource_list:
-                    resource_list[restype] = []
-                resource_list[restype].append(resource)
-            number_of_categories = len(resource_list) * -1
+            # Resources and staff are only fetched when the cached fragments
+            # of the page have expired.
+            resource_list = SimpleLazyObject(
+                lambda: self.group_resources(subject))
             subscription_status = True
             is_hod = False
             has_staff = False
             is_staff = False
-            subject_staff_list = subject.staff.all()
-            if subject_staff_list:
-                has_staff = True
             if request.user.is_authenticated():
                 user = request.user
-                if subject not in user.subscribedsubjects.all():
-                    subscription_status = False
+                subscription_status = user.subscribedsubjects.filter(
+                    id=subject.id).exists()
                 is_hod = is_user_hod(request, subject)
                 is_staff = is_user_hod_or_teacher(request, subject)
+                if is_hod:
+                    has_staff = subject.staff.exists()
             return render(request, 'subject_resource_list.html',
                           {
                               'subject': subject,
@@ -107,8 +117,9 @@ class ViewSubject(View):
                               'is_hod': is_hod,
                               'is_staff': is_staff,
                               'has_staff': has_staff,
-                              'subject_staff_list': subject_staff_list,
-                              'number_of_categories': number_of_categories
+                              'subject_staff_list': subject.staff.all(),
+                              'cache_version': get_version(
+                                  subject_namespace(subject.id))
                           })
         except ObjectDoesNotExist, e:
             print e
@@ -140,8 +151,7 @@ class SubscribeUser(View):
             user = request.user
             if user.is_authenticated():
                 subject = Subject.objects.get(id=subject_id)
-                subject.students.add(user)
-                subject.save()
+                update_subscriptions(user, subscribe=[subject.id])
                 return HttpResponseRedirect('/subject/' + subject_id)
             else:
                 self.error = "You are not logged in."
@@ -167,9 +177,8 @@ class UnsubscribeUser(View):
             subject = Subject.objects.get(id=subject_id)
             if request.user.is_authenticated():
                 user = request.user
-                if user in subject.students.all():
-                    subject.students.remove(user)
-                    subject.save()
+                if subject.students.filter(id=user.id).exists():
+                    update_subscriptions(user, unsubscribe=[subject.id])
                     return HttpResponseRedirect('/subject/' + subject_id)
                 else:
                     self.error = 'You are not subscribed to this subject.'
@@ -179,12 +188,42 @@ class UnsubscribeUser(View):
                 self.status = 403
         except ObjectDoesNotExist:
             self.error = 'The subject you requested does not exist.'
+            self.status = 404
         return render(request, self.template,
                       {
-                          'error': self.status
+                          'error': self.error
                       }, status=self.status)
 
 
+class UpdateSubscriptions(View):
+    '''
+    Subscribe to and unsubscribe from several subjects at once. POST lists
+    of subject ids as `subscribe` and `unsubscribe`. Both GET and POST
+    return the ids of the subjects the user is subscribed to.
+    '''
+
+    def get(self, request):
+        if not request.user.is_authenticated():
+            return JsonResponse({'error': 'You are not logged in.'},
+                                status=403)
+        return JsonResponse(
+            {'subscribed': sorted(subscribed_subject_ids(request.user))})
+
+    def post(self, request):
+        if not request.user.is_authenticated():
+            return JsonResponse({'error': 'You are not logged in.'},
+                                status=403)
+        try:
+            subscribe = [int(x) for x in request.POST.getlist('subscribe')]
+            unsubscribe = [int(x) for x in
+                           request.POST.getlist('unsubscribe')]
+            subscribed = update_subscriptions(request.user, subscribe,
+                                              unsubscribe)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return JsonResponse({'subscribed': sorted(subscribed)})
+
+
 class AssignStaff(View):
     """Assigns staff to a subject. Available to HOD of the subject."""
 
@@ -192,36 +231,27 @@ class AssignStaff(View):
     template = "assign_staff.html"
     status = 200
 
+    def get_context(self, request, subject):
+        return {
+            'is_hod': is_user_hod(request, subject),
+            'staff_list': get_staff_directory(),
+            'subject': subject
+        }
+
     def get(self, request, subject_id):
         subject = Subject.objects.get(id=subject_id)
-        is_hod = is_user_hod(request, subject)
-        staff_list = {}
-        for department in Department.objects.all():
-            staff_list[department.name] = [x.user for
-                                           x in department.profile_set.all()
-                                           if is_user_hod_or_teacher(x)]
         return render(request, self.template,
-                      {
-                          'is_hod': is_hod,
-                          'staff_list': staff_list,
-                          'subject': subject
-                      })
+                      self.get_context(request, subject))
 
     def post(self, request, subject_id):
         subject = Subject.objects.get(id=subject_id)
-        is_hod = is_user_hod(request, subject)
-        staff_list = {}
-        for department in Department.objects.all():
-            staff_list[department.name] = [x.user for
-                                           x in department.profile_set.all()
-                                           if is_user_hod_or_teacher(x)]
+        context = self.get_context(request, subject)
         try:
-            if is_hod:
+            if context['is_hod']:
                 form = AssignOrRemoveStaffForm(request.POST)
                 if form.is_valid():
-                    for staff_id in form.cleaned_data['staffselect']:
-                        staff = User.objects.get(id=staff_id)
-                        subject.staff.add(staff)
+                    subject.staff.add(*[int(x) for x in
+                                        form.cleaned_data['staffselect']])
                 else:
                     self.error = 'Something went wrong.'
                     self.status = 500
@@ -230,13 +260,9 @@ class AssignStaff(View):
                 self.error = 'You are not an HOD'
                 self.status = 403
         except:
-            return render(request, self.template,
-                          {
-                              'is_hod': is_hod,
-                              'staff_list': staff_list,
-                              'subject': subject,
-                              'error': self.error
-                          }, status=self.status)
+            context['error'] = self.error
+            return render(request, self.template, context,
+                          status=self.status)
         return HttpResponseRedirect('/subject/' + subject_id)
 
 
@@ -247,29 +273,27 @@ class RemoveStaff(View):
     template = "remove_staff.html"
     status = 200
 
+    def get_context(self, request, subject):
+        return {
+            'is_hod': is_user_hod(request, subject),
+            'staff_list': subject.staff.all(),
+            'subject': subject
+        }
+
     def get(self, request, subject_id):
         subject = Subject.objects.get(id=subject_id)
-        is_hod = is_user_hod(request, subject)
-        staff_list = subject.staff.all()
         return render(request, self.template,
-                      {
-                          'is_hod': is_hod,
-                          'staff_list': staff_list,
-                          'subject': subject
-                      })
+                      self.get_context(request, subject))
 
     def post(self, request, subject_id):
         subject = Subject.objects.get(id=subject_id)
-        is_hod = is_user_hod(request, subject)
-        staff_list = subject.staff.all()
+        context = self.get_context(request, subject)
         try:
-            if is_hod:
+            if context['is_hod']:
                 form = AssignOrRemoveStaffForm(request.POST)
                 if form.is_valid():
-                    for staff_id in form.cleaned_data['staffselect']:
-                        staff = User.objects.get(id=staff_id)
-                        subject.staff.remove(staff)
-                        subject.save()
+                    subject.staff.remove(*[int(x) for x in
+                                           form.cleaned_data['staffselect']])
                 else:
                     self.error = 'Something went wrong.'
                     self.status = 500
@@ -278,50 +302,15 @@ class RemoveStaff(View):
                 self.error = 'You are not an HOD'
                 self.status = 403
         except:
-            return render(request, self.template,
-                          {
-                              'is_hod': is_hod,
-                              'staff_list': staff_list,
-                              'subject': subject,
-                              'error': self.error
-                          }, status=self.status)
+            context['error'] = self.error
+            return render(request, self.template, context,
+                          status=self.status)
         return HttpResponseRedirect('/subject/' + subject_id)
 
 
 class UploadQuestionBank(View):
     """Upload a subject's question bank"""
 
-    def read_excel_file(self, excelfilepath, subject):
-        """Read excel file which contains question bank and create question objects
-        from it."""
-        workbook = load_workbook(filename=excelfilepath)
-        for row in workbook.worksheets[0].rows:
-            try:
-                questiontext = row[1].value
-                print "Question Text: ", questiontext
-                questionmodule = row[2].value
-                print "Question Module: ", questionmodule
-                questionpart = row[4].value
-                print "Question Part: ", questionpart
-                questionco = row[3].value
-                print "Question CO: ", questionco
-                questionlevel = row[5].value
-                print "Question Level: ", questionlevel
-                question = Question(text=questiontext,
-                                    module=questionmodule,
-                                    part=questionpart,
-                                    co=questionco,
-                                    level=questionlevel
-                                    )
-                question.subject = subject
-                question.save()
-                print questiontext, questionmodule, questionpart, \
-                    questionco, questionlevel
-            except Exception as e:
-                print("Error")
-                print(e)
-                pass
-
     def get(self, request, subject_id):
         subject = Subject.objects.get(id=subject_id)
         return render(request, 'upload_questionbank.html',
@@ -333,18 +322,23 @@ class UploadQuestionBank(View):
         form = QuestionBankUploadForm(request.POST, request.FILES)
         if form.is_valid():
             try:
-                qbfile = request.FILES['qbfile']
-                with open('/tmp/qb.xlsx', 'wb') as destination:
-                    for chunk in qbfile.chunks():
-                        destination.write(chunk)
-                self.read_excel_file('/tmp/qb.xlsx', subject)
-                messages.success(request, "Uploaded succesfully")
-                return HttpResponseRedirect('/subject/' + subject_id)
-            except:
+                report = import_question_bank(request.FILES['qbfile'],
+                                              subject)
+            except WORKBOOK_ERRORS:
                 return render(request, 'upload_questionbank.html',
                               {'subject': subject,
                                'error': 'Some problem with the file',
                                'user': request.user})
+            imported = len([x for x in report if x.status == IMPORTED])
+            messages.success(request, "Uploaded succesfully. %d of %d "
+                             "questions imported." % (imported, len(report)))
+            rejected = [x for x in report if x.status != IMPORTED]
+            if rejected:
+                return render(request, 'upload_questionbank.html',
+                              {'subject': subject,
+                               'report': rejected,
+                               'user': request.user})
+            return HttpResponseRedirect('/subject/' + subject_id)
         else:
             return render(request, 'upload_questionbank.html',
                           {'subject': subject,
@@ -366,129 +360,16 @@ class GenerateQuestionPaper(View):
                        'error': error,
                        'user': request.user})
 
-    def select_random(self, itemlist, count):
-        """Select n items randomly from a list. (Reservoir sampling)"""
-        result = []
-        N = 0
-        for item in itemlist:
-            N += 1
-            if len(result) < count:
-                result.append(item)
-            else:
-                s = int(random.random() * N)
-                if s < count:
-                    result[s] = item
-        return result
-
-    def make_document(self, subject, questions, exam, marks, time):
-
-        print("Questions")
-        print(questions)
-        today = datetime.today()
-        filename = subject.name.replace(' ', '_') + '_' + \
-            str(today.day) + str(today.month) + str(today.year)
-
-        document = Document()
-
-        paragraph = document.add_paragraph()
-        paragraph_format = paragraph.paragraph_format
-        paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        paragraph_text = 'Adi Shankara Institute of Engineering and Technology'
-        run = paragraph.add_run(paragraph_text)
-        run.bold = True
-        font = run.font
-        font.name = 'Times New Roman'
-        font.size = Pt(14)
-
-        paragraph = document.add_paragraph()
-        paragraph_format = paragraph.paragraph_format
-        paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        paragraph_text = exam.name
-        paragraph.add_run(paragraph_text)
-
-        paragraph = document.add_paragraph()
-        paragraph_format = paragraph.paragraph_format
-        paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-        paragraph_text = subject.name
-        paragraph.add_run(paragraph_text)
-
-        paragraph = document.add_paragraph()
-        paragraph_format = paragraph.paragraph_format
-        # length_of_marks = len(str(marks))
-        # length_of_time = len(str(time))
-        number_of_spaces = 100
-        # number_of_spaces = 45 - \
-        # (len('Marks : ') + length_of_marks + len('Time : ') + length_of_time)
-        paragraph_text = "Marks : " + \
-            str(marks) + " " * number_of_spaces + "Time : " + str(time)
-        paragraph.add_run(paragraph_text)
-        for part in ['Part A', 'Part B', 'Part C']:
-            count = 1
-            if questions[part]:
-                paragraph = document.add_paragraph()
-                paragraph_format = paragraph.paragraph_format
-                paragraph_format.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                paragraph_text = part
-                run = paragraph.add_run(paragraph_text)
-                run.bold = True
-                for question in questions[part]:
-                    prefix = str(count) + ". "
-                    text = prefix + question.text
-                    paragraph = document.add_paragraph()
-                    paragraph_format = paragraph.paragraph_format
-                    paragraph.add_run(text)
-                    count = count + 1
-        document.save('/tmp/' + filename + '.docx')
-        qpinfile = open('/tmp/' + filename + '.docx')
-        qpfile = File(qpinfile)
-        exam.questionpaper.save(filename + '.docx', qpfile)
-        return '/uploads/' + exam.questionpaper.url
-
-    def create_qp_dataset(self, subject, exam, totalmarks, time, criteria):
-        """Populates the dataset needed to generate a question paper. Invokes
-        make_document() method"""
-        questions = {'Part A': [], 'Part B': [], 'Part C': []}
-        status = 0
-        for trio in criteria:
-            module = trio[0]
-            part = trio[1]
-            level = trio[2]
-            count = int(trio[3])
-            questiontotallist = Question.objects.filter(
-                module=module, part=part, level=level)
-            part = "Part " + part
-            selectedquestions = self.select_random(
-                questiontotallist, count)
-            questions[part] = questions[part] + selectedquestions
-        if questions:
-            for part in questions:
-                for question in questions[part]:
-                    exam.question_set.add(question)
-                    exam.save()
-            status = 1
-        path = self.make_document(subject, questions, exam, totalmarks, time)
-        return status, path
-
     def post(self, request, subject_id):
         error = ''
         subject = Subject.objects.get(id=subject_id)
         QuestionFormSet = formset_factory(QuestionPaperCategoryForm)
-        print(request.POST)
         QPForm = QuestionPaperGenerateForm(request.POST)
-        examname = ''
-        totalmarks = ''
-        time = ''
-        if QPForm.is_valid():
+        question_categories_set = QuestionFormSet(request.POST)
+        if QPForm.is_valid() and question_categories_set.is_valid():
             examname = QPForm.cleaned_data['examname']
             totalmarks = QPForm.cleaned_data['totalmarks']
             time = QPForm.cleaned_data['time']
-            exam = Exam(name=examname, totalmarks=totalmarks, time=time,
-                        subject_id=subject.id)
-            exam.save()
-        question_categories_set = QuestionFormSet(request.POST)
-        print question_categories_set
-        if question_categories_set.is_valid():
-            print("\n\n\n\n\n\n Form Data \n\n\n\n\n\n\n\n")
             question_criteria = []
             for form in question_categories_set.forms:
                 if form.is_valid():
@@ -497,10 +378,41 @@ class GenerateQuestionPaper(View):
                     level = form.cleaned_data['level']
                     count = form.cleaned_data['count']
                     question_criteria.append((module, part, level, count))
-            status, path = self.create_qp_dataset(subject, exam,
-                                                  totalmarks, time,
-                                                  question_criteria)
-            return HttpResponseRedirect(path)
+            sets = QPForm.cleaned_data['sets'] or 1
+            max_overlap = QPForm.cleaned_data['max_overlap'] or 0
+            try:
+                if QPForm.cleaned_data['blueprint'].strip():
+                    blueprint = json.loads(QPForm.cleaned_data['blueprint'])
+                    if isinstance(blueprint, dict):
+                        blueprint.setdefault('total_marks', totalmarks)
+                    question_criteria = Blueprint.from_dict(blueprint)
+                    # Solving every set once rejects an infeasible blueprint
+                    # before any exam is created.
+                    select_sets(subject, question_criteria, sets)
+                else:
+                    # A trial draw of every set, which is not kept.
+                    draw_sets(get_pool(subject.id), question_criteria, sets,
+                              max_overlap)
+            except ValueError as e:
+                return render(request, 'generatequestionpaper.html',
+                              {'subject': subject,
+                               'qpformset': question_categories_set,
+                               'error': force_text(e),
+                               'user': request.user})
+            with transaction.atomic():
+                exams = []
+                for i in range(sets):
+                    name = examname
+                    if sets > 1:
+                        name += ' - Set ' + chr(ord('A') + i)
+                    exams.append(Exam.objects.create(
+                        name=name, totalmarks=totalmarks, time=time,
+                        subject_id=subject.id,
+                        set_of=exams[0] if exams else None))
+                exam = exams[0]
+                enqueue_questionpaper(exam, question_criteria, max_overlap)
+            return HttpResponseRedirect('/subject/' + subject_id +
+                                        '/questionpaper/' + str(exam.id))
         else:
             error = 'Choose some questions.'
             return render(request, 'generatequestionpaper.html',
@@ -512,23 +424,89 @@ class GenerateQuestionPaper(View):
 
 class ViewQuestions(View):
     '''
-    View available questions of a subject.
+    View available questions of a subject, a page at a time. The module,
+    part, co and level parameters filter the questions, unused_in leaves out
+    those in the latest given number of question papers, and sort=least_used
+    puts the least used first. With format=json the page is returned as
+    JSON.
     '''
 
+    per_page = 50
+    filters = ('module', 'part', 'co', 'level')
+    fields = ('id', 'text', 'module', 'part', 'co', 'level')
+    orderings = OrderedDict([
+        ('id', ['id']),
+        ('least_used', ['times_used', 'id']),
+    ])
+
     def get(self, request, subject_id):
         subject = Subject.objects.get(id=subject_id)
+        as_json = request.GET.get('format') == 'json'
         if not is_user_hod_or_teacher(request, subject):
             self.error = 'You are not authorized to visit this page.'
             self.status = 403
+            if as_json:
+                return JsonResponse({'error': self.error},
+                                    status=self.status)
             self.template = 'error.html'
             return render(request, self.template,
                           {
                               'error': self.error
                           }, status=self.status)
-        else:
-            return render(request, 'viewquestions.html',
-                          {'subject': subject,
-                           'user': request.user})
+        filters = dict((x, request.GET[x]) for x in self.filters
+                       if request.GET.get(x))
+        sort = request.GET.get('sort')
+        if sort not in self.orderings:
+            sort = 'id'
+        query = dict(filters, sort=sort)
+        try:
+            questions = Question.objects.filter(
+                subject=subject, **filters).only(*self.fields).annotate(
+                    times_used=Coalesce('usage__use_count', Value(0)),
+                    last_used=F('usage__last_used'))
+            if request.GET.get('unused_in'):
+                query['unused_in'] = int(request.GET['unused_in'])
+                if query['unused_in'] < 1:
+                    raise ValueError('Invalid number of exams')
+                cutoff = recent_cutoff(subject.id, query['unused_in'])
+                fresh = Q(usage=None)
+                if cutoff is not None:
+                    fresh |= Q(usage__last_used__lt=cutoff)
+                questions = questions.filter(fresh)
+            page = paginate(questions, self.orderings[sort], self.per_page,
+                            after=request.GET.get('after'),
+                            before=request.GET.get('before'))
+        except ValueError:
+            self.error = 'Invalid filter or page.'
+            self.status = 400
+            if as_json:
+                return JsonResponse({'error': self.error},
+                                    status=self.status)
+            return render(request, 'error.html',
+                          {
+                              'error': self.error
+                          }, status=self.status)
+        if as_json:
+            return JsonResponse({
+                'questions': [dict((x, getattr(question, x))
+                                   for x in self.fields +
+                                   ('times_used', 'last_used'))
+                              for question in page],
+                'next': page.next_cursor,
+                'previous': page.previous_cursor,
+            })
+        return render(request, 'viewquestions.html',
+                      {'subject': subject,
+                       'page': page,
+                       'filters': filters,
+                       'sort': sort,
+                       'sort_options': self.orderings.keys(),
+                       'unused_in': query.get('unused_in', ''),
+                       'next_query': urlencode(
+                           dict(query, after=page.next_cursor)),
+                       'previous_query': urlencode(
+                           dict(query, before=page.previous_cursor)),
+                       'user': request.user})
 
 
 class ViewQuestionpapers(View):
@@ -568,7 +546,7 @@ class ViewAQuestionpaper(View):
                               'error': self.error
                           }, status=self.status)
         exam = Exam.objects.get(id=exam_id)
-        if exam.subject != subject:
+        if exam.subject_id != subject.id:
             self.error = 'No such exam for this subject found.'
             self.status = 404
             self.template = 'error.html'
@@ -576,21 +554,56 @@ class ViewAQuestionpaper(View):
                           {
                               'error': self.error
                           }, status=self.status)
+        lead_id = exam.set_of_id or exam.id
+        job = QuestionPaperJob.objects.filter(exam_id=lead_id).first()
+        sets = list(Exam.objects.filter(
+            Q(id=lead_id) | Q(set_of_id=lead_id)).order_by('id').only(
+                'id', 'name'))
         return render(request, 'viewaquestionpaper.html',
                       {'subject': subject,
                        'exam': exam,
+                       'job': job,
+                       'sets': sets if len(sets) > 1 else [],
                        'user': request.user})
 
 
+class QuestionpaperStatus(View):
+    '''
+    Report the generation status of a question paper.
+    '''
+
+    def get(self, request, subject_id, exam_id):
+        subject = Subject.objects.get(id=subject_id)
+        if not is_user_hod_or_teacher(request, subject):
+            return JsonResponse({'error': 'Not authorized'}, status=403)
+        try:
+            exam = Exam.objects.get(id=exam_id, subject=subject)
+        except ObjectDoesNotExist:
+            return JsonResponse({'error': 'No such exam'}, status=404)
+        job = QuestionPaperJob.objects.filter(
+            exam_id=exam.set_of_id or exam.id).first()
+        status = job.status if job else QuestionPaperJob.DONE
+        response = {'status': status, 'error': job.error if job else ''}
+        if exam.questionpaper:
+            response['url'] = '/uploads/' + exam.questionpaper.url
+        return JsonResponse(response)
+
+
 class ViewSubjects(View):
     '''
-    List all subjects.
+    List all subjects, the most subscribed first.
     '''
     def get(self, request):
-        departments = Department.objects.all()
-        logged_in = False
-        if request.user and request.user.is_authenticated():
-            logged_in = True
+        departments = Department.objects.prefetch_related(Prefetch(
+            'subject_set', queryset=Subject.objects.order_by(
+                '-subscriber_count', 'name')))
+        subject_listing = [(department, department.subject_set.all())
+                           for department in departments
+                           if department.subject_set.all()]
+        permissions = get_permissions(request)
+        logged_in = permissions.is_authenticated
+        subscribed_ids = permissions.subscribed_subject_ids
         return render(request, 'viewsubjects.html',
                       {'logged_in': logged_in,
-                       'departments': departments})
+                       'subject_listing': subject_listing,
+                       'subscribed_ids': subscribed_ids})
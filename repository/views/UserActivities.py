@@ -13,7 +13,8 @@ from PIL import Image
 
 from repository.forms import (EditProfileForm, ProfilePictureCropForm,
                               ProfilePictureUploadForm, SignInForm, SignUpForm)
-from repository.models import Department, Profile
+from repository.models import Profile
+from repository.referencedata import get_departments
 from shared import is_user_current_user, is_user_hod_or_teacher
 
 
@@ -83,7 +84,6 @@ class UserSignOut(View):
 class UserSignUp(View):
     """Handle sign-up action of user"""
 
-    department_list = Department.objects.all()
     error = ""
     template = 'signup.html'
 
@@ -94,7 +94,7 @@ class UserSignUp(View):
             return HttpResponseRedirect('/')
         else:
             return render(request, self.template,
-                          {'department_list': self.department_list})
+                          {'department_list': get_departments()})
 
     def post(self, request):
         if 'user' in list(request.session.keys()):
@@ -154,6 +154,8 @@ class UserSubjects(View):
                 self.subject_list = user.teachingsubjects.all()
             else:
                 self.subject_list = user.subscribedsubjects.all()
+            self.subject_list = self.subject_list.select_related(
+                'department').order_by('-subscriber_count', 'name')
             if not self.subject_list:
                 self.error = 'You are not subscribed to any subjects'
                 self.status = 404
@@ -277,6 +279,8 @@ class UserProfile(View):
                     subject_list = user.teachingsubjects.all()
                 else:
                     subject_list = user.subscribedsubjects.all()
+                subject_list = subject_list.select_related(
+                    'department').order_by('-subscriber_count', 'name')
             return render(request, 'profile.html',
                           {
                               'user': user,
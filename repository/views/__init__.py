@@ -2,6 +2,7 @@ import StaticPages
 import UserActivities
 import ResourceActivities
 import SubjectActivities
+import DownloadActivities
 import sys
 import os
 sys.path.insert(0, os.path.abspath('/repository'))
@@ -1,39 +1,28 @@
+from repository.permissions import PermissionContext
+
+
+def get_permissions(request):
+    """Return the permission context of the request. It is normally attached
+    by PermissionMiddleware."""
+    permissions = getattr(request, 'permissions', None)
+    if permissions is None:
+        permissions = request.permissions = PermissionContext(request.user)
+    return permissions
+
+
 def is_user_hod(request, subject):
     """This method returns whether the current user is hod of the subject."""
-    if not request.user.is_authenticated():
-        return False
-    user = request.user
-    if user.profile.status == 'hod' and \
-            user.profile.department == subject.department:
-        return True
-    else:
-        return False
+    return get_permissions(request).is_hod_of(subject)
 
 
 def is_user_current_user(request, username):
-    if not request.user.is_authenticated():
-        return False
-    if request.user.username == username:
-        return True
-    else:
-        return False
+    permissions = get_permissions(request)
+    return permissions.is_authenticated and permissions.username == username
 
 
 def is_user_hod_or_teacher(request, subject=None):
-    if not request.user.is_authenticated():
-        return False
-    user = request.user
+    permissions = get_permissions(request)
     if subject:
-        if user.profile.department == subject.department:
-            if user.profile.status == 'hod' or \
-                    user.profile.status == 'teacher':
-                return True
-            else:
-                return False
-        else:
-            return False
+        return permissions.is_staff_of(subject)
     else:
-        if user.profile.status == 'hod' or user.profile.status == 'teacher':
-            return True
-        else:
-            return False
+        return permissions.is_hod_or_teacher
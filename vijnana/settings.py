@@ -42,11 +42,13 @@ INSTALLED_APPS = (
 )
 
 MIDDLEWARE_CLASSES = (
+    'repository.middleware.RequestProfilingMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.auth.middleware.SessionAuthenticationMiddleware',
+    'repository.middleware.PermissionMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 )
@@ -121,4 +123,48 @@ PASSWORD_HASHERS = (
 
 MEDIA_ROOT = '/home/balasankarc/git/vijnana_django/vijnana/repository/uploads/'
 
-TEST_RUNNER = 'django_nose.NoseTestSuiteRunner'
+TEST_RUNNER = 'vijnana.testrunner.TestRunner'
+
+# The cache must be shared by every process: the web server's and the
+# question paper workers. Cached pages, lists and question pools are
+# invalidated by bumping versions or deleting keys in one process, and the
+# others only see that through the cache. The file based cache is shared by
+# the processes of one host; use memcached when running on several.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache'),
+        'OPTIONS': {
+            # Past this, a third of the entries are culled at random.
+            'MAX_ENTRIES': 10000,
+        },
+    }
+}
+
+# Used instead of CACHES by the tests and by `manage.py benchmark_urls`, so
+# that their synthetic data never reaches the site's cache.
+TEST_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'test',
+    }
+}
+
+# Number of worker processes started by `manage.py questionpaper_workers`
+QUESTIONPAPER_WORKERS = 4
+
+# Processes a job uses to render the papers of a batch of question paper sets
+QUESTIONPAPER_RENDER_PROCESSES = 4
+
+# Let the front proxy send uploaded files instead of streaming them through
+# Django. Set to 'xsendfile' (Apache mod_xsendfile, lighttpd) or 'xaccel'
+# (nginx). With 'xaccel', SENDFILE_URL_PREFIX is the internal location that
+# maps to MEDIA_ROOT.
+SENDFILE_BACKEND = None
+SENDFILE_URL_PREFIX = '/protected/'
+
+# Share of requests whose SQL queries and timings are logged by
+# repository.middleware.RequestProfilingMiddleware. The records go to the
+# repository.profiling logger at DEBUG level; configure a handler for it in
+# LOGGING to collect them.
+REQUEST_PROFILING_SAMPLE_RATE = 0.05
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.test.utils import override_settings
+from django_nose import NoseTestSuiteRunner
+
+
+class TestRunner(NoseTestSuiteRunner):
+    """Runs the tests with settings.TEST_CACHES in place of the site's
+    cache, and without request profiling unless a test turns it on."""
+
+    def setup_test_environment(self, **kwargs):
+        super(TestRunner, self).setup_test_environment(**kwargs)
+        self.test_settings = override_settings(
+            CACHES=settings.TEST_CACHES, REQUEST_PROFILING_SAMPLE_RATE=0)
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        super(TestRunner, self).teardown_test_environment(**kwargs)
@@ -1,10 +1,8 @@
-from django.conf import settings
 from django.conf.urls import include, url
 from django.contrib import admin
-from django.views.static import serve
 
-from repository.views import (ResourceActivities, StaticPages,
-                              SubjectActivities, UserActivities)
+from repository.views import (DownloadActivities, ResourceActivities,
+                              StaticPages, SubjectActivities, UserActivities)
 
 urlpatterns = [
     url(r'^admin/', include(admin.site.urls)),
@@ -56,26 +54,17 @@ urlpatterns = [
         SubjectActivities.ViewQuestionpapers.as_view()),
     url(r'subject/(?P<subject_id>[0-9]+)/questionpaper/(?P<exam_id>[0-9]+)(/)?$',
         SubjectActivities.ViewAQuestionpaper.as_view()),
+    url(r'subject/(?P<subject_id>[0-9]+)/questionpaper/(?P<exam_id>[0-9]+)/status$',
+        SubjectActivities.QuestionpaperStatus.as_view()),
     url(r'^subjects$',
         SubjectActivities.ViewSubjects.as_view()),
+    url(r'^subjects/subscriptions$',
+        SubjectActivities.UpdateSubscriptions.as_view()),
     url(r'^uploads/resources/(?P<path>.*)$',
-        serve,
-        {
-            'document_root': settings.MEDIA_ROOT + 'resources',
-        }
-        ),
+        DownloadActivities.ServeUpload.as_view(directory='resources')),
     url(r'^uploads/profile_pictures/(?P<path>.*)$',
-        serve,
-        {
-            'document_root': settings.MEDIA_ROOT +
-            'profile_pictures',
-        }
-        ),
+        DownloadActivities.ServeUpload.as_view(
+            directory='profile_pictures')),
     url(r'^uploads/questionpapers/(?P<path>.*)$',
-        serve,
-        {
-            'document_root': settings.MEDIA_ROOT +
-            'questionpapers',
-        }
-        )
+        DownloadActivities.ServeUpload.as_view(directory='questionpapers'))
 ]